@@ -1,4 +1,9 @@
 import ast
+import copyreg
+from collections import namedtuple
+from copy import deepcopy
+from functools import partial
+from types import FunctionType, MappingProxyType
 from ast import (
     Compare,
     Num,
@@ -13,21 +18,57 @@ from ast import (
     Module,
 )
 
+# Frozen instances reject `self.x = ...`, so their generated methods store values with
+# `object.__setattr__` instead.
+object_setattr = object.__setattr__
+# The arguments of a frozen `__init__` are named after the fields, so the generated code
+# calls `hash` through this alias, which a field called `hash` doesn't shadow.
+builtin_hash = hash
+# Slot caching the hash of a frozen instance. Backing attributes are named `_<field>`,
+# so only a field called `_inrange_hash__` could produce it, and that name is reserved.
+HASH_SLOT = "__inrange_hash__"
+# Names that the generated `__init__` of a frozen class reads, or that would collide
+# with its slots, so they can't be used for its fields.
+FROZEN_RESERVED = {
+    "self",
+    "object_setattr",
+    "builtin_hash",
+    "ValueError",
+    "_inrange_hash__",
+}
+# Pickling `(copyreg.__newobj__, (cls,), state)` uses the compact NEWOBJ opcode.
+copyreg_newobj = copyreg.__newobj__
+# Default value of the arguments of the generated `update`, for fields not being set.
+MISSING = object()
+# Maps a key describing a generated accessor to its compiled code object, so that
+# fields with the same name and range share one code object across all classes.
+CODE_CACHE = dict()
 
-def inrange(cls):
+
+def inrange(cls=None, *, frozen=False, revalidate=True, compact=False):
     """Generate properties that can be set in specified ranges.
 
+    The decorator may be used as `@inrange` or with options, e.g.
+    `@inrange(frozen=True)`. Frozen classes take their values in `__init__`, can't be
+    modified afterwards, and can be used as dictionary keys. Unpickled values are
+    checked against their ranges unless `revalidate=False` is given, which should only
+    be done when pickles come from a trusted source. With `compact=True` instances
+    are pickled as a tuple of their values, which is smaller but slower to pickle
+    than the default.
+
     partof:
       - #SPC-asts
       - #SPC-asts.decorator
     """
+    if cls is None:
+        return partial(inrange, frozen=frozen, revalidate=revalidate, compact=compact)
     if type(cls) is not type:
         raise MacroError("'inrange' may only be applied to class definitions")
     try:
         cls.__annotations__
     except AttributeError:
         raise MacroError("No annotations found")
-    return produce(cls)
+    return produce(cls, frozen=frozen, revalidate=revalidate, compact=compact)
 
 
 class MacroError(Exception):
@@ -37,6 +78,13 @@ class MacroError(Exception):
     pass
 
 
+class FrozenInstanceError(AttributeError):
+    """Exception raised when assigning to a field of a frozen instance.
+    """
+
+    pass
+
+
 class MacroItem:
 
     """
@@ -56,6 +104,18 @@ class MacroItem:
         self.init_stmt = None
 
 
+class Field(namedtuple("Field", ["name", "lower", "upper"])):
+
+    """
+    Read-only record of a single field and its bounds, kept on the decorated class.
+
+    partof: #SPC-asts.fields
+
+    """
+
+    __slots__ = ()
+
+
 def collect_vars(cls):
     """Collect the class variables to process.
 
@@ -150,11 +210,52 @@ def ast_to_func(node, name):
     return context[name]
 
 
+def compile_func(name, arg_names, body):
+    """Construct a function with positional arguments and the given body.
+    """
+    func_args = arguments(
+        args=[arg(arg=arg_name, annotation=None) for arg_name in arg_names],
+        kwonlyargs=[],
+        vararg=None,
+        kwarg=None,
+        defaults=[],
+        kw_defaults=[],
+    )
+    func_node = FunctionDef(
+        name=name, args=func_args, body=body, decorator_list=[], returns=None
+    )
+    mod_node = Module(body=[func_node])
+    return ast_to_func(mod_node, name)
+
+
+def interned_func(key, name, compile_accessor, item):
+    """Construct a function from the code object interned under `key`.
+
+    The code object is compiled by `compile_accessor(item)` the first time the key is
+    seen. After that only a new function object is created.
+
+    partof: #SPC-asts.intern
+    """
+    try:
+        code = CODE_CACHE[key]
+    except KeyError:
+        code = compile_accessor(item).__code__
+        CODE_CACHE[key] = code
+    return FunctionType(code, globals(), name)
+
+
 def getter(item):
     """Construct the getter function.
 
     partof: #SPC-asts.getter
     """
+    key = ("getter", item.var)
+    return interned_func(key, f"{item.var}_getter", compile_getter, item)
+
+
+def compile_getter(item):
+    """Compile a new getter function.
+    """
     func_name = f"{item.var}_getter"
     self_arg = arg(arg="self", annotation=None)
     func_args = arguments(
@@ -176,26 +277,47 @@ def getter(item):
     return ast_to_func(mod_node, func_name)
 
 
-def setter_body(item):
-    """Construct the body of the setter function.
+def range_comparison(item, value):
+    """Construct the comparison `lower < value < upper`.
     """
-    new_value = Name(id="new", ctx=ast.Load())
-    inst_var = Attribute(
-        value=Name(id="self", ctx=ast.Load()), attr=f"_{item.var}", ctx=ast.Store()
-    )
     comp_node = Compare(
         left=Num(n=item.lower),
         ops=[ast.Lt(), ast.Lt()],
-        comparators=[new_value, Num(n=item.upper)],
+        comparators=[value, Num(n=item.upper)],
     )
-    assign_stmt = ast.Assign(targets=[inst_var], value=new_value)
+    return comp_node
+
+
+def range_error(item):
+    """Construct the `raise ValueError(...)` statement for a value outside the range.
+    """
     except_msg = f"value outside of range {item.lower} < {item.var} < {item.upper}"
     exc = ast.Call(
         func=Name(id="ValueError", ctx=ast.Load()),
         args=[ast.Str(s=except_msg)],
         keywords=[],
     )
-    else_body = ast.Raise(exc=exc, cause=None)
+    return ast.Raise(exc=exc, cause=None)
+
+
+def range_check(item, value):
+    """Construct `if not lower < value < upper: raise ValueError(...)`.
+    """
+    comp_node = range_comparison(item, value)
+    test = ast.UnaryOp(op=ast.Not(), operand=comp_node)
+    return ast.If(test=test, body=[range_error(item)], orelse=[])
+
+
+def setter_body(item):
+    """Construct the body of the setter function.
+    """
+    new_value = Name(id="new", ctx=ast.Load())
+    inst_var = Attribute(
+        value=Name(id="self", ctx=ast.Load()), attr=f"_{item.var}", ctx=ast.Store()
+    )
+    comp_node = range_comparison(item, new_value)
+    assign_stmt = ast.Assign(targets=[inst_var], value=new_value)
+    else_body = range_error(item)
     if_node = ast.If(test=comp_node, body=[assign_stmt], orelse=[else_body])
     return if_node
 
@@ -205,6 +327,14 @@ def setter(item):
 
     partof: #SPC-asts.setter
     """
+    # `repr` keeps endpoints like `1` and `1.0` apart, which compare and hash equal
+    key = ("setter", item.var, repr(item.lower), repr(item.upper))
+    return interned_func(key, f"{item.var}_setter", compile_setter, item)
+
+
+def compile_setter(item):
+    """Compile a new setter function.
+    """
     func_name = f"{item.var}_setter"
     self_arg = arg(arg="self", annotation=None)
     new_arg = arg(arg="new", annotation=None)
@@ -227,6 +357,225 @@ def setter(item):
     return ast_to_func(mod_node, func_name)
 
 
+def record_local(item):
+    """The name of the local variable holding the field's value in `from_records`.
+
+    The prefix keeps field names from clashing with the other locals of the function.
+    """
+    return f"v_{item.var}"
+
+
+def unpack_record(items):
+    """Construct the statement that unpacks a record into one local per field.
+
+    Dictionaries are unpacked by key, anything else is unpacked like a tuple in the
+    order that the fields were declared.
+    """
+    record = Name(id="record", ctx=ast.Load())
+    dict_stmts = []
+    for item in items:
+        key = ast.Index(value=ast.Str(s=item.var))
+        value = ast.Subscript(value=record, slice=key, ctx=ast.Load())
+        target = Name(id=record_local(item), ctx=ast.Store())
+        dict_stmts.append(ast.Assign(targets=[target], value=value))
+    targets = [Name(id=record_local(item), ctx=ast.Store()) for item in items]
+    tuple_target = ast.Tuple(elts=targets, ctx=ast.Store())
+    tuple_stmt = ast.Assign(targets=[tuple_target], value=record)
+    is_dict = ast.Call(
+        func=Name(id="isinstance", ctx=ast.Load()),
+        args=[record, Name(id="dict", ctx=ast.Load())],
+        keywords=[],
+    )
+    return ast.If(test=is_dict, body=dict_stmts, orelse=[tuple_stmt])
+
+
+def record_handler():
+    """Construct the `except` clause that hands a bad record to the error handler.
+    """
+    handle = Name(id="handle", ctx=ast.Load())
+    is_raise = Compare(
+        left=handle, ops=[ast.Is()], comparators=[Name(id="None", ctx=ast.Load())]
+    )
+    reraise = ast.If(test=is_raise, body=[ast.Raise(exc=None, cause=None)], orelse=[])
+    call = ast.Call(
+        func=handle,
+        args=[Name(id="record", ctx=ast.Load()), Name(id="error", ctx=ast.Load())],
+        keywords=[],
+    )
+    errors = ast.Tuple(
+        elts=[
+            Name(id="KeyError", ctx=ast.Load()),
+            Name(id="TypeError", ctx=ast.Load()),
+            Name(id="ValueError", ctx=ast.Load()),
+        ],
+        ctx=ast.Load(),
+    )
+    return ast.ExceptHandler(
+        type=errors, name="error", body=[reraise, ast.Expr(value=call), ast.Continue()]
+    )
+
+
+def set_backing(inst_name, item, value, frozen=False):
+    """Construct the statement that stores `value` in the backing attribute `_var`.
+    """
+    inst = Name(id=inst_name, ctx=ast.Load())
+    if not frozen:
+        target = Attribute(value=inst, attr=f"_{item.var}", ctx=ast.Store())
+        return ast.Assign(targets=[target], value=value)
+    call = ast.Call(
+        func=Name(id="object_setattr", ctx=ast.Load()),
+        args=[inst, ast.Str(s=f"_{item.var}"), value],
+        keywords=[],
+    )
+    return ast.Expr(value=call)
+
+
+def set_hash(inst_name, values):
+    """Construct the statement that caches the hash of a frozen instance's values.
+    """
+    hash_call = ast.Call(
+        func=Name(id="builtin_hash", ctx=ast.Load()),
+        args=[ast.Tuple(elts=values, ctx=ast.Load())],
+        keywords=[],
+    )
+    call = ast.Call(
+        func=Name(id="object_setattr", ctx=ast.Load()),
+        args=[Name(id=inst_name, ctx=ast.Load()), ast.Str(s=HASH_SLOT), hash_call],
+        keywords=[],
+    )
+    return ast.Expr(value=call)
+
+
+def build_record(items, frozen=False):
+    """Construct the statements that create an instance from the validated locals.
+
+    The instance is created with `cls.__new__` and its backing attributes are set
+    directly, since the values have already been checked.
+    """
+    cls_new = Attribute(
+        value=Name(id="cls", ctx=ast.Load()), attr="__new__", ctx=ast.Load()
+    )
+    new_call = ast.Call(
+        func=cls_new,
+        args=[Name(id="cls", ctx=ast.Load())],
+        keywords=[],
+    )
+    stmts = [ast.Assign(targets=[Name(id="inst", ctx=ast.Store())], value=new_call)]
+    values = [Name(id=record_local(item), ctx=ast.Load()) for item in items]
+    for item, value in zip(items, values):
+        stmts.append(set_backing("inst", item, value, frozen))
+    if frozen:
+        stmts.append(set_hash("inst", values))
+    stmts.append(ast.Expr(value=ast.Yield(value=Name(id="inst", ctx=ast.Load()))))
+    return stmts
+
+
+def from_records(items, frozen=False):
+    """Construct the `from_records` generator function.
+
+    The generated function looks like this for a class with the fields `x` and `y`:
+
+        def from_records(cls, records, on_error="raise"):
+            handle = error_handler(on_error)
+            for record in records:
+                try:
+                    if isinstance(record, dict):
+                        v_x = record["x"]
+                        v_y = record["y"]
+                    else:
+                        v_x, v_y = record
+                    if not 0 < v_x < 1:
+                        raise ValueError(...)
+                    if not 0 < v_y < 1:
+                        raise ValueError(...)
+                except (KeyError, TypeError, ValueError) as error:
+                    if handle is None:
+                        raise
+                    handle(record, error)
+                    continue
+                inst = cls.__new__(cls)
+                inst._x = v_x
+                inst._y = v_y
+                yield inst
+
+    partof: #SPC-asts.records
+    """
+    checks = [
+        range_check(item, Name(id=record_local(item), ctx=ast.Load())) for item in items
+    ]
+    try_node = ast.Try(
+        body=[unpack_record(items)] + checks,
+        handlers=[record_handler()],
+        orelse=[],
+        finalbody=[],
+    )
+    loop = ast.For(
+        target=Name(id="record", ctx=ast.Store()),
+        iter=Name(id="records", ctx=ast.Load()),
+        body=[try_node] + build_record(items, frozen),
+        orelse=[],
+    )
+    handler_call = ast.Call(
+        func=Name(id="error_handler", ctx=ast.Load()),
+        args=[Name(id="on_error", ctx=ast.Load())],
+        keywords=[],
+    )
+    handler_stmt = ast.Assign(
+        targets=[Name(id="handle", ctx=ast.Store())], value=handler_call
+    )
+    func_args = arguments(
+        args=[
+            arg(arg="cls", annotation=None),
+            arg(arg="records", annotation=None),
+            arg(arg="on_error", annotation=None),
+        ],
+        kwonlyargs=[],
+        vararg=None,
+        kwarg=None,
+        defaults=[ast.Str(s="raise")],
+        kw_defaults=[],
+    )
+    func_node = FunctionDef(
+        name="from_records",
+        args=func_args,
+        body=[handler_stmt, loop],
+        decorator_list=[],
+        returns=None,
+    )
+    mod_node = Module(body=[func_node])
+    return ast_to_func(mod_node, "from_records")
+
+
+def error_handler(on_error):
+    """Convert the `on_error` argument of `from_records` into a function.
+
+    - `"raise"` stops at the first bad record (returns `None`).
+    - `"skip"` drops bad records silently.
+    - A list collects `(record, error)` pairs.
+    - Any other callable is called as `on_error(record, error)`.
+    """
+    if type(on_error) is str:
+        if on_error == "raise":
+            return None
+        if on_error == "skip":
+            return skip_record
+        raise ValueError(f"Invalid value for on_error: {on_error}")
+    if isinstance(on_error, list):
+
+        def collect(record, error):
+            on_error.append((record, error))
+
+        return collect
+    if callable(on_error):
+        return on_error
+    raise TypeError("on_error must be 'raise', 'skip', a list, or a callable")
+
+
+def skip_record(record, error):
+    """Error handler used by `from_records(..., on_error="skip")`."""
+    pass
+
+
 def make_init_stmt(item):
     """Make the AST for the initialization statement (`self._var = None`).
     """
@@ -239,13 +588,25 @@ def make_init_stmt(item):
 
 def populate_macro_items(cls):
     """Parse the annotations and construct the getter/setter functions.
+
+    If the class's module has already been scanned, the range endpoints found by the
+    scan are used instead of parsing the annotations again.
+
+    partof: #SPC-scan.lookup
     """
+    # Imported here since the scanner uses the helpers in this module
+    from annotation_abuse.scan import lookup
+
+    entry = lookup(cls)
     items = collect_vars(cls)
     new_items = []
     for item in items:
         item_cpy = item
-        comp = parse(item_cpy)
-        lower, upper = extract_endpoints(comp)
+        if entry is not None and entry.has_range(item_cpy):
+            lower, upper = entry.ranges[item_cpy.var][1:]
+        else:
+            comp = parse(item_cpy)
+            lower, upper = extract_endpoints(comp)
         item_cpy.lower, item_cpy.upper = lower, upper
         item_cpy.init_stmt = make_init_stmt(item_cpy)
         item_cpy.getter = getter(item_cpy)
@@ -293,16 +654,583 @@ def bind_init(cls, items):
     partof: #SPC-asts.bind
     """
     init_func = make_init(items)
-    setattr(cls, "__init__", init_func.__get__(cls))
+    setattr(cls, "__init__", init_func)
+
+
+def frozen_init(items):
+    """Construct the `__init__` function of a frozen class.
 
+    Every field is a required argument. The values are checked, stored, and hashed
+    once, here.
+
+    partof: #SPC-asts.frozen
+    """
+    init = empty_init_ast()
+    init.args.args.extend(arg(arg=item.var, annotation=None) for item in items)
+    values = [Name(id=item.var, ctx=ast.Load()) for item in items]
+    for item, value in zip(items, values):
+        init.body.append(range_check(item, value))
+    for item, value in zip(items, values):
+        init.body.append(set_backing("self", item, value, frozen=True))
+    init.body.append(set_hash("self", values))
+    mod_node = Module(body=[init])
+    return ast_to_func(mod_node, "__init__")
 
-def produce(cls):
+
+def frozen_eq(items):
+    """Construct the `__eq__` function of a frozen class.
+
+    The cached hashes are compared first, since that rules out most unequal pairs
+    without comparing every field.
+
+    partof: #SPC-asts.frozen
+    """
+    self_node = Name(id="self", ctx=ast.Load())
+    other_node = Name(id="other", ctx=ast.Load())
+    self_cls = Attribute(value=self_node, attr="__class__", ctx=ast.Load())
+    other_cls = Attribute(value=other_node, attr="__class__", ctx=ast.Load())
+    not_same_cls = Compare(left=other_cls, ops=[ast.IsNot()], comparators=[self_cls])
+    not_impl = Return(value=Name(id="NotImplemented", ctx=ast.Load()))
+    check_cls = ast.If(test=not_same_cls, body=[not_impl], orelse=[])
+    comparisons = []
+    for attr in [HASH_SLOT] + [f"_{item.var}" for item in items]:
+        comparisons.append(
+            Compare(
+                left=Attribute(value=self_node, attr=attr, ctx=ast.Load()),
+                ops=[ast.Eq()],
+                comparators=[Attribute(value=other_node, attr=attr, ctx=ast.Load())],
+            )
+        )
+    ret_stmt = Return(value=ast.BoolOp(op=ast.And(), values=comparisons))
+    return compile_func("__eq__", ["self", "other"], [check_cls, ret_stmt])
+
+
+def frozen_hash():
+    """Construct the `__hash__` function of a frozen class, which returns the cache.
+
+    partof: #SPC-asts.frozen
+    """
+    self_node = Name(id="self", ctx=ast.Load())
+    cache = Attribute(value=self_node, attr=HASH_SLOT, ctx=ast.Load())
+    return compile_func("__hash__", ["self"], [Return(value=cache)])
+
+
+def frozen_setattr(self, name, value):
+    """Replacement `__setattr__` for frozen classes.
+
+    partof: #SPC-asts.frozen
+    """
+    raise FrozenInstanceError(
+        f"cannot assign to field '{name}' of frozen {type(self).__name__}"
+    )
+
+
+def frozen_delattr(self, name):
+    """Replacement `__delattr__` for frozen classes.
+
+    partof: #SPC-asts.frozen
+    """
+    raise FrozenInstanceError(
+        f"cannot delete field '{name}' of frozen {type(self).__name__}"
+    )
+
+
+def field_values(inst_name, items):
+    """Construct the expression `(inst._var1, inst._var2, ...)`.
+    """
+    inst = Name(id=inst_name, ctx=ast.Load())
+    values = [
+        Attribute(value=inst, attr=f"_{item.var}", ctx=ast.Load()) for item in items
+    ]
+    return ast.Tuple(elts=values, ctx=ast.Load())
+
+
+def backing_names(items):
+    """Construct the constant `frozenset({"_var1", "_var2", ...})`.
+
+    `ast.Constant` is used since there's no literal syntax for a frozenset, and a
+    constant is built once when the function is compiled rather than on every call.
+    """
+    names = frozenset(f"_{item.var}" for item in items)
+    return ast.Constant(value=names)
+
+
+def extra_state(inst, backing):
+    """Returns the instance attributes that aren't backing attributes, or `None`.
+
+    These are attributes that aren't fields, e.g. ones set by a subclass's `__init__`.
+
+    partof: #SPC-asts.pickle
+    """
+    try:
+        inst_dict = inst.__dict__
+    except AttributeError:
+        return None
+    if inst_dict.keys() <= backing:
+        return None
+    return {name: value for name, value in inst_dict.items() if name not in backing}
+
+
+def copy_extra(inst, new_inst, backing, memo=None):
+    """Copy the extra attributes of an instance to its copy, deeply if `memo` is given.
+
+    partof: #SPC-asts.pickle
+    """
+    extra = extra_state(inst, backing)
+    if extra is None:
+        return
+    if memo is not None:
+        memo[id(inst)] = new_inst
+        extra = deepcopy(extra, memo)
+    new_inst.__dict__.update(extra)
+
+
+def state_body(items, make_value):
+    """Construct the statements that return `make_value(state)`.
+
+    The state is the tuple of field values, followed by a dictionary of the extra
+    attributes if the instance has any:
+
+        extra = extra_state(self, frozenset({"_x", "_y"}))
+        if extra is None:
+            return make_value((self._x, self._y))
+        return make_value((self._x, self._y, extra))
+    """
+    extra_call = ast.Call(
+        func=Name(id="extra_state", ctx=ast.Load()),
+        args=[Name(id="self", ctx=ast.Load()), backing_names(items)],
+        keywords=[],
+    )
+    extra_stmt = ast.Assign(
+        targets=[Name(id="extra", ctx=ast.Store())], value=extra_call
+    )
+    no_extra = Compare(
+        left=Name(id="extra", ctx=ast.Load()),
+        ops=[ast.Is()],
+        comparators=[ast.NameConstant(value=None)],
+    )
+    fields_only = Return(value=make_value(field_values("self", items)))
+    with_extra = field_values("self", items)
+    with_extra.elts.append(Name(id="extra", ctx=ast.Load()))
+    return [
+        extra_stmt,
+        ast.If(test=no_extra, body=[fields_only], orelse=[]),
+        Return(value=make_value(with_extra)),
+    ]
+
+
+def make_getstate(items):
+    """Construct `__getstate__`, which returns the field values in declaration order.
+
+    partof: #SPC-asts.pickle
+    """
+    body = state_body(items, lambda state: state)
+    return compile_func("__getstate__", ["self"], body)
+
+
+def restore_extra(inst, state, n_fields):
+    """Restore the extra attributes stored after the field values in a pickled state.
+
+    Returns the field values.
+
+    partof: #SPC-asts.pickle
+    """
+    inst.__dict__.update(state[n_fields])
+    return state[:n_fields]
+
+
+def check_state(items, frozen=False, revalidate=True):
+    """Construct the range checks of the unpickled values held in the `v_<var>` locals.
+
+    Fields of non-frozen instances that were never set hold `None`, which isn't checked.
+    """
+    if not revalidate:
+        return []
+    checks = []
+    values = [Name(id=record_local(item), ctx=ast.Load()) for item in items]
+    for item, value in zip(items, values):
+        check = range_check(item, value)
+        if not frozen:
+            none = ast.NameConstant(value=None)
+            is_set = Compare(left=value, ops=[ast.IsNot()], comparators=[none])
+            check = ast.If(test=is_set, body=[check], orelse=[])
+        checks.append(check)
+    return checks
+
+
+def default_state(state):
+    """Returns the attributes in a state made by default pickling, by name.
+
+    Instances with `__slots__` are pickled as `(__dict__ or None, slot values)`.
+
+    partof: #SPC-asts.pickle
+    """
+    if type(state) is dict:
+        return state
+    inst_dict, slots = state
+    if inst_dict is None:
+        return slots
+    return {**inst_dict, **slots}
+
+
+def restore_default(inst, state):
+    """Store the attributes of a state made by default pickling on the instance.
+
+    Slots are written with `object.__setattr__`, since frozen instances reject
+    `setattr`.
+
+    partof: #SPC-asts.pickle
+    """
+    if type(state) is not dict:
+        state, slots = state
+        for name, value in slots.items():
+            object_setattr(inst, name, value)
+    if state:
+        inst.__dict__.update(state)
+
+
+def make_default_setstate(items, frozen=False, revalidate=True):
+    """Construct `__setstate__` for the state made by default pickling.
+
+    Pickling is left to `object.__reduce_ex__`, which is implemented in C, so only
+    unpickling runs generated code. For the fields `x` and `y` the function looks like:
+
+        def __setstate__(self, state):
+            is_dict = type(state) is dict
+            attrs = state if is_dict else default_state(state)
+            v_x = attrs.get("_x")
+            v_y = attrs.get("_y")
+            if v_x is not None:
+                if not 0 < v_x < 1:
+                    raise ValueError(...)
+            ...
+            if is_dict:
+                self.__dict__.update(state)
+            else:
+                restore_default(self, state)
+
+    Instances without `__slots__` take the first branch, which avoids calling the
+    helpers. Frozen instances recompute their hash instead of trusting the pickled
+    one.
+
+    partof: #SPC-asts.pickle
+    """
+    self_node = Name(id="self", ctx=ast.Load())
+    state = Name(id="state", ctx=ast.Load())
+    attrs = Name(id="attrs", ctx=ast.Load())
+    is_dict = Name(id="is_dict", ctx=ast.Load())
+    state_type = ast.Call(
+        func=Name(id="type", ctx=ast.Load()), args=[state], keywords=[]
+    )
+    check_type = Compare(
+        left=state_type, ops=[ast.Is()], comparators=[Name(id="dict", ctx=ast.Load())]
+    )
+    body = [ast.Assign(targets=[Name(id="is_dict", ctx=ast.Store())], value=check_type)]
+    if revalidate or frozen:
+        state_call = ast.Call(
+            func=Name(id="default_state", ctx=ast.Load()), args=[state], keywords=[]
+        )
+        choose = ast.IfExp(test=is_dict, body=state, orelse=state_call)
+        attrs_target = Name(id="attrs", ctx=ast.Store())
+        body.append(ast.Assign(targets=[attrs_target], value=choose))
+        for item in items:
+            get = Attribute(value=attrs, attr="get", ctx=ast.Load())
+            value = ast.Call(func=get, args=[ast.Str(s=f"_{item.var}")], keywords=[])
+            target = Name(id=record_local(item), ctx=ast.Store())
+            body.append(ast.Assign(targets=[target], value=value))
+    body.extend(check_state(items, frozen, revalidate))
+    self_dict = Attribute(value=self_node, attr="__dict__", ctx=ast.Load())
+    update = Attribute(value=self_dict, attr="update", ctx=ast.Load())
+    update_call = ast.Call(func=update, args=[state], keywords=[])
+    restore_call = ast.Call(
+        func=Name(id="restore_default", ctx=ast.Load()),
+        args=[self_node, state],
+        keywords=[],
+    )
+    restore = ast.If(
+        test=is_dict,
+        body=[ast.Expr(value=update_call)],
+        orelse=[ast.Expr(value=restore_call)],
+    )
+    body.append(restore)
+    if frozen:
+        values = [Name(id=record_local(item), ctx=ast.Load()) for item in items]
+        body.append(set_hash("self", values))
+    return compile_func("__setstate__", ["self", "state"], body)
+
+
+def make_setstate(items, frozen=False, revalidate=True):
+    """Construct `__setstate__`, which restores the tuple made by `__getstate__`.
+
+    partof: #SPC-asts.pickle
+    """
+    state = Name(id="state", ctx=ast.Load())
+    n_fields = Num(n=len(items))
+    state_len = ast.Call(func=Name(id="len", ctx=ast.Load()), args=[state], keywords=[])
+    restore_call = ast.Call(
+        func=Name(id="restore_extra", ctx=ast.Load()),
+        args=[Name(id="self", ctx=ast.Load()), state, n_fields],
+        keywords=[],
+    )
+    restore = ast.If(
+        test=Compare(left=state_len, ops=[ast.Gt()], comparators=[n_fields]),
+        body=[
+            ast.Assign(targets=[Name(id="state", ctx=ast.Store())], value=restore_call)
+        ],
+        orelse=[],
+    )
+    targets = [Name(id=record_local(item), ctx=ast.Store()) for item in items]
+    unpack = ast.Assign(
+        targets=[ast.Tuple(elts=targets, ctx=ast.Store())],
+        value=Name(id="state", ctx=ast.Load()),
+    )
+    body = [restore, unpack] + check_state(items, frozen, revalidate)
+    values = [Name(id=record_local(item), ctx=ast.Load()) for item in items]
+    body.extend(
+        set_backing("self", item, value, frozen) for item, value in zip(items, values)
+    )
+    if frozen:
+        body.append(set_hash("self", values))
+    return compile_func("__setstate__", ["self", "state"], body)
+
+
+def make_reduce(items, name="__reduce__", arg_names=("self",)):
+    """Construct `__reduce__`, which pickles an instance as its class and its state.
+
+    The same function is generated as `__reduce_ex__`, which ignores the protocol.
+
+    partof: #SPC-asts.pickle
+    """
+    self_cls = Attribute(
+        value=Name(id="self", ctx=ast.Load()), attr="__class__", ctx=ast.Load()
+    )
+
+    def reduce_value(state):
+        return ast.Tuple(
+            elts=[
+                Name(id="copyreg_newobj", ctx=ast.Load()),
+                ast.Tuple(elts=[self_cls], ctx=ast.Load()),
+                state,
+            ],
+            ctx=ast.Load(),
+        )
+
+    return compile_func(name, arg_names, state_body(items, reduce_value))
+
+
+def copy_body(items, frozen=False, deep=False):
+    """Construct the body shared by `__copy__` and `__deepcopy__`.
+
+    The values are numbers, which are immutable, so a deep copy doesn't need to copy
+    them. Other attributes are copied with `copy_extra`. Frozen instances are
+    immutable as a whole, so they are their own copies.
+    """
+    self_node = Name(id="self", ctx=ast.Load())
+    if frozen:
+        return [Return(value=self_node)]
+    self_cls = Attribute(value=self_node, attr="__class__", ctx=ast.Load())
+    cls_new = Attribute(value=self_cls, attr="__new__", ctx=ast.Load())
+    new_call = ast.Call(func=cls_new, args=[self_cls], keywords=[])
+    body = [ast.Assign(targets=[Name(id="inst", ctx=ast.Store())], value=new_call)]
+    for item in items:
+        value = Attribute(value=self_node, attr=f"_{item.var}", ctx=ast.Load())
+        body.append(set_backing("inst", item, value))
+    copy_args = [self_node, Name(id="inst", ctx=ast.Load()), backing_names(items)]
+    if deep:
+        copy_args.append(Name(id="memo", ctx=ast.Load()))
+    copy_call = ast.Call(
+        func=Name(id="copy_extra", ctx=ast.Load()), args=copy_args, keywords=[]
+    )
+    body.append(ast.Expr(value=copy_call))
+    body.append(Return(value=Name(id="inst", ctx=ast.Load())))
+    return body
+
+
+def bind_pickling(cls, items, frozen=False, revalidate=True, compact=False):
+    """Add the pickling and copying methods to the class.
+
+    By default instances are pickled by `object.__reduce_ex__` and only `__setstate__`
+    is generated, to check the values. Without the checks and a hash to recompute
+    there's nothing for it to do, so it's left out. With `compact` the state is a tuple
+    of the values, which makes smaller pickles but is built by generated Python code.
+
+    partof: #SPC-asts.pickle
+    """
+    if compact:
+        setattr(cls, "__getstate__", make_getstate(items))
+        setattr(cls, "__setstate__", make_setstate(items, frozen, revalidate))
+        setattr(cls, "__reduce__", make_reduce(items))
+        # Pickle looks up `__reduce_ex__` first, and `object.__reduce_ex__` would only
+        # call `__reduce__` in turn
+        reduce_ex = make_reduce(items, "__reduce_ex__", ["self", "protocol"])
+        setattr(cls, "__reduce_ex__", reduce_ex)
+    elif revalidate or frozen:
+        setstate = make_default_setstate(items, frozen, revalidate)
+        setattr(cls, "__setstate__", setstate)
+    copy_func = compile_func("__copy__", ["self"], copy_body(items, frozen))
+    setattr(cls, "__copy__", copy_func)
+    deepcopy_func = compile_func(
+        "__deepcopy__", ["self", "memo"], copy_body(items, frozen, deep=True)
+    )
+    setattr(cls, "__deepcopy__", deepcopy_func)
+
+
+def if_given(value, body):
+    """Construct `if value is not MISSING: <body>`.
+    """
+    test = Compare(
+        left=value, ops=[ast.IsNot()], comparators=[Name(id="MISSING", ctx=ast.Load())]
+    )
+    return ast.If(test=test, body=body, orelse=[])
+
+
+def make_update(items):
+    """Construct `update`, which sets any of the fields given as keyword arguments.
+
+    Every given value is checked before any of them is stored, so an invalid value
+    leaves the instance unchanged. For the fields `x` and `y` the function looks like:
+
+        def update(self, *, x=MISSING, y=MISSING):
+            if x is not MISSING:
+                if not 0 < x < 1:
+                    raise ValueError(...)
+            if y is not MISSING:
+                if not 0 < y < 1:
+                    raise ValueError(...)
+            if x is not MISSING:
+                self._x = x
+            if y is not MISSING:
+                self._y = y
+
+    partof: #SPC-asts.update
+    """
+    values = [Name(id=item.var, ctx=ast.Load()) for item in items]
+    checks = [
+        if_given(value, [range_check(item, value)])
+        for item, value in zip(items, values)
+    ]
+    stores = [
+        if_given(value, [set_backing("self", item, value)])
+        for item, value in zip(items, values)
+    ]
+    func_args = arguments(
+        args=[arg(arg="self", annotation=None)],
+        kwonlyargs=[arg(arg=item.var, annotation=None) for item in items],
+        vararg=None,
+        kwarg=None,
+        defaults=[],
+        kw_defaults=[Name(id="MISSING", ctx=ast.Load()) for _ in items],
+    )
+    func_node = FunctionDef(
+        name="update",
+        args=func_args,
+        body=checks + stores or [ast.Pass()],
+        decorator_list=[],
+        returns=None,
+    )
+    mod_node = Module(body=[func_node])
+    return ast_to_func(mod_node, "update")
+
+
+def bind_fields(cls, items):
+    """Attach the read-only `__inrange_fields__` table, mapping names to `Field`s.
+
+    Only the names and endpoints are kept, so the `MacroItem`s and the ASTs they hold
+    can be freed once the class has been produced.
+
+    partof: #SPC-asts.fields
+    """
+    fields = {item.var: Field(item.var, item.lower, item.upper) for item in items}
+    setattr(cls, "__inrange_fields__", MappingProxyType(fields))
+
+
+def slotted_class(cls, slots):
+    """Recreate the class with `__slots__`.
+
+    Slots can't be added to a class after it has been created, so a new class is made
+    from the same name, bases, and namespace, and the methods are pointed at it.
+
+    partof: #SPC-asts.frozen
+    """
+    namespace = dict(cls.__dict__)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    for name in namespace.get("__slots__", []):
+        namespace.pop(name, None)
+    namespace["__slots__"] = tuple(slots)
+    namespace["__qualname__"] = cls.__qualname__
+    new_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    for value in namespace.values():
+        for func in namespace_funcs(value):
+            rebind_class_cell(func, cls, new_cls)
+    return new_cls
+
+
+def namespace_funcs(value):
+    """Returns the functions held by a value from a class namespace.
+    """
+    if isinstance(value, (classmethod, staticmethod)):
+        return [value.__func__]
+    if isinstance(value, property):
+        return [func for func in (value.fget, value.fset, value.fdel) if func]
+    return [value]
+
+
+def rebind_class_cell(func, old_cls, new_cls):
+    """Point the `__class__` cell of a method at the recreated class.
+
+    Methods that use `super()` or `__class__` refer to the class they were defined in
+    through a closure cell, which would otherwise still hold the original class.
+    """
+    try:
+        free_vars = func.__code__.co_freevars
+        closure = func.__closure__ or ()
+    except AttributeError:
+        return
+    for name, cell in zip(free_vars, closure):
+        if name == "__class__" and cell.cell_contents is old_cls:
+            cell.cell_contents = new_cls
+
+
+def produce_frozen(cls, items, revalidate=True, compact=False):
+    """Generate the definition of a frozen, hashable class.
+
+    partof: #SPC-asts.frozen
+    """
+    for item in items:
+        if item.var in FROZEN_RESERVED:
+            raise MacroError(f"'{item.var}' can't be the name of a frozen field")
+    slots = [f"_{item.var}" for item in items] + [HASH_SLOT]
+    cls = slotted_class(cls, slots)
+    setattr(cls, "__init__", frozen_init(items))
+    for item in items:
+        setattr(cls, item.var, property(item.getter))
+    setattr(cls, "__setattr__", frozen_setattr)
+    setattr(cls, "__delattr__", frozen_delattr)
+    setattr(cls, "__eq__", frozen_eq(items))
+    setattr(cls, "__hash__", frozen_hash())
+    setattr(cls, "from_records", classmethod(from_records(items, frozen=True)))
+    bind_pickling(cls, items, frozen=True, revalidate=revalidate, compact=compact)
+    bind_fields(cls, items)
+    return cls
+
+
+def produce(cls, frozen=False, revalidate=True, compact=False):
     """Generate the new class definition.
 
     partof: #SPC-asts.property
     """
+    from annotation_abuse.index import add_index
+
     items = populate_macro_items(cls)
+    if frozen:
+        return produce_frozen(cls, items, revalidate, compact)
     bind_init(cls, items)
     for item in items:
         setattr(cls, item.var, property(item.getter, item.setter))
+    setattr(cls, "from_records", classmethod(from_records(items)))
+    setattr(cls, "update", make_update(items))
+    setattr(cls, "index", classmethod(add_index))
+    bind_pickling(cls, items, revalidate=revalidate, compact=compact)
+    bind_fields(cls, items)
     return cls
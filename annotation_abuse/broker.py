@@ -0,0 +1,166 @@
+"""#SPC-broker"""
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, wait
+import os
+import threading
+
+import annotation_abuse.notify as notify_mod
+from annotation_abuse.notify import Response, render_value, set_approver
+
+
+class ApprovalBroker:
+    """Answers approval requests from worker processes at the parent's terminal.
+
+    Worker processes usually have no usable stdin, so they can't prompt the user
+    themselves. The broker listens on a local socket, collects the writes that are
+    waiting for approval, and asks the user once per batch.
+
+    partof: #SPC-broker.parent
+    """
+
+    def __init__(self, address=("localhost", 0), authkey=None):
+        self.address = address
+        self.authkey = os.urandom(16) if authkey is None else authkey
+        self._listener = None
+        self._connections = []
+        self._conn_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def worker_args(self):
+        """The arguments to pass to `connect` in each worker process."""
+        return (self.address, self.authkey)
+
+    def start(self):
+        """Start listening for workers in background threads."""
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._accept_loop, daemon=True),
+            threading.Thread(target=self._serve_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        """Stop answering requests and close all connections."""
+        if self._listener is None:
+            return
+        self._stop.set()
+        # Closing the listener doesn't wake up a thread blocked in `accept`, so a
+        # throwaway connection is made to let it see that the broker is stopping.
+        Client(self.address, authkey=self.authkey).close()
+        for thread in self._threads:
+            thread.join()
+        self._listener.close()
+        self._listener = None
+        with self._conn_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # A client hung up or failed authentication before connecting.
+                continue
+            with self._conn_lock:
+                self._connections.append(conn)
+
+    def _serve_loop(self):
+        while not self._stop.is_set():
+            with self._conn_lock:
+                conns = list(self._connections)
+            if not conns:
+                self._stop.wait(0.05)
+                continue
+            batch = []
+            for conn in wait(conns, timeout=0.05):
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    self._drop(conn)
+                    continue
+                batch.append((conn, request))
+            if batch:
+                self.answer(batch)
+
+    def _drop(self, conn):
+        with self._conn_lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    def answer(self, batch):
+        """Ask the user about a batch of pending writes and reply to each worker.
+
+        Each item in `batch` is a `(connection, (name, old_value, new_value))` pair.
+        A message is shown for every distinct write, followed by a single prompt whose
+        answer applies to the whole batch.
+
+        partof: #SPC-broker.batch
+        """
+        shown = set()
+        # The parent's own threads may be prompting at the same terminal
+        with notify_mod.PROMPT_LOCK:
+            for _, request in batch:
+                if request not in shown:
+                    shown.add(request)
+                    notify_mod.show_message(*request)
+            user_resp = notify_mod.prompt_user()
+        for conn, _ in batch:
+            try:
+                conn.send(user_resp.name)
+            except (EOFError, OSError):
+                self._drop(conn)
+        return user_resp
+
+
+class BrokerClient:
+    """Forwards approval requests from a worker process to an `ApprovalBroker`.
+
+    The connection is opened on the first request, so a client created before a fork
+    is never shared between processes.
+
+    partof: #SPC-broker.worker
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def __call__(self, name, old_value, new_value):
+        # The values are sent as text since they may not be picklable, and text is all
+        # the parent needs to show the message. Only as much as the message would show
+        # is rendered and sent.
+        request = (name, render_value(old_value), render_value(new_value))
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=self.authkey)
+            self._conn.send(request)
+            return Response[self._conn.recv()]
+
+
+def connect(address, authkey):
+    """Send this process's approval requests to the broker listening at `address`.
+
+    This is meant to be used as the initializer of a process pool:
+
+        with ApprovalBroker() as broker:
+            pool = ProcessPoolExecutor(initializer=connect, initargs=broker.worker_args)
+
+    partof: #SPC-broker.worker
+    """
+    set_approver(BrokerClient(address, authkey))
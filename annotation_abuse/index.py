@@ -0,0 +1,199 @@
+"""#SPC-index"""
+import weakref
+
+from functools import partial
+
+from annotation_abuse.asts import MacroError, restore_default
+
+
+class RangeIndex:
+
+    """
+    Instances of an `inrange` class, bucketed by the value of one field.
+
+    Every field has finite bounds, so the range is split into `buckets` buckets of
+    equal width. Instances are stored by `id` with a weak reference, so the index
+    doesn't keep them alive and they don't need to be hashable.
+
+    partof: #SPC-index.buckets
+
+    """
+
+    def __init__(self, field, buckets):
+        self.field = field
+        self.backing = f"_{field.name}"
+        self.n_buckets = buckets
+        self.scale = buckets / (field.upper - field.lower)
+        # Each bucket maps `id(inst)` to a weak reference to the instance
+        self.buckets = [dict() for _ in range(buckets)]
+        # Maps `id(inst)` to the number of the bucket holding the instance
+        self.positions = dict()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def bucket_of(self, value):
+        """Returns the number of the bucket that `value` belongs in."""
+        value = min(max(value, self.field.lower), self.field.upper)
+        number = int((value - self.field.lower) * self.scale)
+        return min(number, self.n_buckets - 1)
+
+    def add(self, inst, value):
+        """Store the instance in the bucket for `value`, moving it if necessary.
+
+        partof: #SPC-index.update
+        """
+        key = id(inst)
+        self.discard(key)
+        if value is None:
+            return
+        number = self.bucket_of(value)
+        self.buckets[number][key] = weakref.ref(inst, partial(self.forget, key))
+        self.positions[key] = number
+
+    def discard(self, key):
+        """Remove the instance with the given `id` from the index, if it's there."""
+        number = self.positions.pop(key, None)
+        if number is not None:
+            del self.buckets[number][key]
+
+    def forget(self, key, ref):
+        """Weak reference callback that removes an instance when it's collected."""
+        self.discard(key)
+
+    def between(self, lo, hi):
+        """Returns a list of the instances with `lo <= value < hi`.
+
+        Only the buckets at either end of the query need their values checked.
+
+        partof: #SPC-index.query
+        """
+        found = []
+        if not lo < hi:
+            return found
+        first, last = self.bucket_of(lo), self.bucket_of(hi)
+        for number in range(first, last + 1):
+            refs = list(self.buckets[number].values())
+            check = number == first or number == last
+            for ref in refs:
+                inst = ref()
+                if inst is None:
+                    continue
+                if check and not lo <= getattr(inst, self.backing) < hi:
+                    continue
+                found.append(inst)
+        return found
+
+
+def track(inst):
+    """Add an instance to every index of its class.
+
+    partof: #SPC-index.update
+    """
+    for index in type(inst).__inrange_indexes__.values():
+        index.add(inst, getattr(inst, index.backing))
+
+
+def indexed_setter(setter, index):
+    """Wrap a generated setter so that it keeps `index` up to date.
+
+    partof: #SPC-index.update
+    """
+
+    def set_indexed(self, new):
+        setter(self, new)
+        index.add(self, new)
+
+    return set_indexed
+
+
+def indexed_records(from_records):
+    """Wrap the generated `from_records` so that new instances are indexed."""
+
+    def from_indexed_records(cls, records, on_error="raise"):
+        for inst in from_records(cls, records, on_error):
+            track(inst)
+            yield inst
+
+    return from_indexed_records
+
+
+def indexed_setstate(setstate):
+    """Wrap the generated `__setstate__` so that unpickled instances are indexed."""
+
+    def setstate_indexed(self, state):
+        setstate(self, state)
+        track(self)
+
+    return setstate_indexed
+
+
+def indexed_update(update):
+    """Wrap the generated `update` so that it keeps the indexes up to date."""
+
+    def update_indexed(self, **fields):
+        update(self, **fields)
+        track(self)
+
+    return update_indexed
+
+
+def indexed_copy(copy_func):
+    """Wrap the generated `__copy__` or `__deepcopy__` so that copies are indexed."""
+
+    def copy_indexed(self, *args):
+        inst = copy_func(self, *args)
+        track(inst)
+        return inst
+
+    return copy_indexed
+
+
+def track_instances(cls):
+    """Make the methods that set values without the setters update the indexes.
+
+    partof: #SPC-index.update
+    """
+    from_records = cls.__dict__["from_records"].__func__
+    setattr(cls, "from_records", classmethod(indexed_records(from_records)))
+    # Classes decorated with `revalidate=False` are unpickled the default way
+    setstate = getattr(cls, "__setstate__", restore_default)
+    setattr(cls, "__setstate__", indexed_setstate(setstate))
+    setattr(cls, "update", indexed_update(cls.update))
+    setattr(cls, "__copy__", indexed_copy(cls.__copy__))
+    setattr(cls, "__deepcopy__", indexed_copy(cls.__deepcopy__))
+
+
+def add_index(cls, var, buckets=256):
+    """Create an index over the values of the field `var`, bound as `cls.index`.
+
+    Only instances whose value is set after the index is created are indexed. Asking
+    for an index that already exists returns it.
+
+    partof: #SPC-index.create
+    """
+    if "__inrange_fields__" not in cls.__dict__:
+        raise MacroError("Indexes must be created on the decorated class")
+    # Instances are stored by weak reference, which needs a `__weakref__` slot
+    if not cls.__weakrefoffset__:
+        raise MacroError(f"{cls.__name__} has __slots__ without '__weakref__'")
+    try:
+        field = cls.__inrange_fields__[var]
+    except KeyError:
+        raise MacroError(f"'{var}' is not a field of {cls.__name__}")
+    if type(buckets) is not int or buckets < 1:
+        raise ValueError("buckets must be a positive integer")
+    indexes = cls.__dict__.get("__inrange_indexes__")
+    if indexes is None:
+        indexes = dict()
+        setattr(cls, "__inrange_indexes__", indexes)
+        track_instances(cls)
+    if var in indexes:
+        if indexes[var].n_buckets != buckets:
+            raise MacroError(f"{cls.__name__}.{var} is already indexed")
+        return indexes[var]
+    index = RangeIndex(field, buckets)
+    prop = cls.__dict__[var]
+    setattr(cls, var, property(prop.fget, indexed_setter(prop.fset, index)))
+    indexes[var] = index
+    return index
@@ -1,7 +1,13 @@
 """#SPC-notify"""
 import ast
 from enum import Enum
+from functools import partial, wraps
+import inspect
+import reprlib
 import sys
+import textwrap
+import threading
+import weakref
 
 MARKER = "this one"
 BLOCK_TYPES = [
@@ -18,6 +24,22 @@ BLOCK_TYPES = [
     ast.AsyncWith,
     ast.Module,
 ]
+# Stands in for the current value of an attribute that hasn't been set yet.
+UNSET = object()
+# There is only one terminal, so only one prompt may be shown at a time no matter how
+# many classes or threads are waiting on the user.
+PROMPT_LOCK = threading.RLock()
+# Classes decorated with `@notify(lazy=True)` that haven't been analyzed yet, mapped to
+# their own `__init__` (`None` if it's inherited) and the lock their `__setattr__`
+# should use.
+PENDING = weakref.WeakKeyDictionary()
+ANALYSIS_LOCK = threading.RLock()
+# Maps the filename and code object of an `__init__` to the marked instance variables
+# it assigns. Equal code objects from different files are kept apart.
+INIT_VARS = dict()
+# The most characters of a value that are shown in a message. Inside its quotes and the
+# speech bubble, a value this long still fits on an 80 character line.
+VALUE_BUDGET = 60
 NICE = r"""
     \
      \
@@ -44,33 +66,134 @@ ANGRY = r"""
 """
 
 
+class NotifyError(Exception):
+    """Exception raised when the marked variables of a class can't be found.
+    """
+
+    pass
+
+
 class Response(Enum):
     YES = ["y", "Y", "yes", "Yes", "YES"]
     NO = ["n", "N", "no", "No", "NO"]
     INVALID = ""
 
 
-def notify(cls):
+def notify(cls=None, *, threadsafe=False, lazy=False):
     """Prints a message when assigning to variables annotated with 'this one'.
 
+    The decorator may be used as `@notify` or with options, e.g.
+    `@notify(threadsafe=True)`. In thread-safe mode writes to marked variables wait in
+    line for the user's answer instead of showing several prompts at once. In lazy mode
+    the class's source isn't analyzed until the first instance has been initialized,
+    or until `prewarm` is called.
+
     partof: #SPC-notify.decorator
     """
+    if cls is None:
+        return partial(notify, threadsafe=threadsafe, lazy=lazy)
     if type(cls) is not type:
         raise TypeError("'notify' may only be applied to classes")
-    class_vars = detect_classvars(cls)
-    inst_vars = find_instvars(cls)
-    marked_vars = inst_vars + class_vars
-    new_setattr = make_setattr(cls, marked_vars)
-    setattr(cls, "__setattr__", new_setattr.__get__(cls))
+    lock = PROMPT_LOCK if threadsafe else None
+    if lazy:
+        defer_analysis(cls, lock)
+        return cls
+    install_setattr(cls, lock)
     return cls
 
 
+def install_setattr(cls, lock):
+    """Find the marked variables and replace the class's `__setattr__`."""
+    marked_vars = find_marked_vars(cls)
+    new_setattr = make_setattr(cls, marked_vars, lock)
+    setattr(cls, "__setattr__", new_setattr)
+
+
+def defer_analysis(cls, lock):
+    """Postpone the source analysis until the first instance has been initialized.
+
+    The class's `__init__` is wrapped so that the analysis runs once `__init__` has
+    returned. Assignments made during that first `__init__` are never intercepted,
+    since they're initializations. A class that inherits `__init__` gets a wrapper
+    around the inherited one, which is removed again by the analysis.
+
+    partof: #SPC-notify.lazy
+    """
+    # `None` if the class inherits `__init__`
+    init = cls.__dict__.get("__init__")
+
+    @wraps(cls.__init__)
+    def first_init(self, *args, **kwargs):
+        if init is None:
+            super(cls, self).__init__(*args, **kwargs)
+        else:
+            init(self, *args, **kwargs)
+        prewarm(cls)
+
+    with ANALYSIS_LOCK:
+        PENDING[cls] = (init, lock)
+        setattr(cls, "__init__", first_init)
+
+
+def prewarm(*classes):
+    """Analyze lazily decorated classes now instead of on first use.
+
+    With no arguments every class still waiting to be analyzed is processed. Classes
+    that have already been analyzed are skipped.
+
+    partof: #SPC-notify.lazy
+    """
+    with ANALYSIS_LOCK:
+        if len(classes) == 0:
+            classes = list(PENDING.keys())
+        for cls in classes:
+            pending = PENDING.pop(cls, None)
+            if pending is None:
+                continue
+            init, lock = pending
+            # The original `__init__` has to be back in place before the analysis,
+            # which looks up its source by line number.
+            if init is None:
+                delattr(cls, "__init__")
+            else:
+                setattr(cls, "__init__", init)
+            install_setattr(cls, lock)
+
+
+def find_marked_vars(cls):
+    """Returns the marked instance and class variables of the class.
+
+    The first class decorated in a module triggers a scan of the whole module, and the
+    rest of the classes in the module use the results of that scan rather than parsing
+    the module again.
+
+    partof: #SPC-scan.lookup
+    """
+    # Imported here since the scanner uses the helpers in this module
+    from annotation_abuse.scan import lookup
+
+    entry = lookup(cls, scan=True)
+    if entry is None or not entry.describes(cls):
+        class_vars = detect_classvars(cls)
+    else:
+        class_vars = list(entry.classvars)
+    # A decorated base class's `__setattr__` is skipped (see `find_base_setattr`), so
+    # the class variables it marks have to be intercepted here
+    for klass in cls.__mro__[1:]:
+        for var in detect_classvars(klass):
+            if var not in class_vars:
+                class_vars.append(var)
+    return find_instvars(cls) + class_vars
+
+
 def detect_classvars(cls):
     """Extracts the names of marked class variables.
 
+    Only the annotations in the class body are searched, not those of base classes.
+
     partof: #SPC-notify.classvars
     """
-    annotations = getattr(cls, "__annotations__", None)
+    annotations = cls.__dict__.get("__annotations__", None)
     if annotations is None:
         return []
     classvars = []
@@ -126,25 +249,93 @@ def build_func_cache(parent_node):
     return func_nodes
 
 
-def find_init_ast(cls):
-    """Returns the AST of the class's `__init__` method.
+def find_instvars(cls):
+    """Returns a list of marked instance variables.
+
+    Every class in the MRO that defines its own `__init__` is searched, so a subclass
+    that inherits `__init__` still finds the variables marked by its base classes. The
+    result for each `__init__` is remembered, so a base class shared by many subclasses
+    is only analyzed once. A base class's `__init__` without any source, e.g. one
+    generated by `dataclass`, has no marked variables.
+
+    partof:
+      - #SPC-notify-inst
+      - #SPC-notify-inst.mro
+    """
+    marked_inst_vars = []
+    for klass in cls.__mro__:
+        init = klass.__dict__.get("__init__")
+        # Look through the wrapper installed by `@notify(lazy=True)`
+        init = getattr(init, "__wrapped__", init)
+        if getattr(init, "__code__", None) is None:
+            continue
+        init_vars = init_instvars(init)
+        if init_vars is None:
+            if klass is cls:
+                name = init.__qualname__
+                raise NotifyError(f"Could not find the source of {name} to analyze it")
+            continue
+        for var in init_vars:
+            if var not in marked_inst_vars:
+                marked_inst_vars.append(var)
+    return marked_inst_vars
+
+
+def init_instvars(init):
+    """Returns the marked instance variables assigned by a single `__init__` function.
+
+    The function's source file is scanned once, and the result is stored by code
+    object. If the file couldn't be scanned, the function is analyzed on its own.
+    Returns `None` if the function has no source at all.
+
+    partof: #SPC-notify-inst.mro
+    """
+    code = init.__code__
+    key = (code.co_filename, code)
+    try:
+        return INIT_VARS[key]
+    except KeyError:
+        pass
+    # Imported here since the scanner uses the helpers in this module
+    from annotation_abuse.scan import INITS, scan_file
+
+    scan_file(code.co_filename)
+    try:
+        marked_inst_vars = INITS[(code.co_filename, code.co_firstlineno)]
+    except KeyError:
+        marked_inst_vars = source_instvars(init)
+    INIT_VARS[key] = marked_inst_vars
+    return marked_inst_vars
+
+
+def source_instvars(init):
+    """Returns the marked instance variables of an `__init__` that wasn't scanned.
+
+    The source of the function is looked up with `inspect`, which also finds functions
+    defined in an interactive session. If the source that's found doesn't define the
+    function, as for the functions generated by `inrange`, there are no marked
+    variables. Returns `None` if there's no source to look at.
 
     partof: #SPC-notify-inst.initast
     """
-    mod_ast = module_ast(cls)
-    cache = build_func_cache(mod_ast)
-    init_ast = cache[cls.__init__.__code__.co_firstlineno]
-    return init_ast
+    try:
+        source = inspect.getsource(init)
+    except (OSError, TypeError):
+        return None
+    try:
+        init_node = ast.parse(textwrap.dedent(source)).body[0]
+    except (SyntaxError, IndexError):
+        return []
+    if type(init_node) is not ast.FunctionDef or init_node.name != init.__name__:
+        return []
+    return marked_instvars(init_node)
 
 
-def find_instvars(cls):
-    """Returns a list of marked instance variables.
+def marked_instvars(init_node):
+    """Returns the marked instance variables assigned in the AST of an `__init__`.
 
     partof: #SPC-notify-inst
     """
-    if inherits_init(cls):
-        return []
-    init_node = find_init_ast(cls)
     annotated_assignments = recurse_init(init_node)
     marked_inst_vars = []
     for item in annotated_assignments:
@@ -176,42 +367,214 @@ def recurse_init(node):
     return ann_assigns
 
 
-def make_setattr(cls, var_names):
+def make_setattr(cls, var_names, lock=None):
     """Make a `__setattr__` that detects writes to certain attributes.
 
-    partof: #SPC-notify-intercept
+    If `lock` is given, it is held from the moment the current value is read until the
+    new value has been set (or rejected). Writes to unmarked attributes and first-time
+    initializations never touch the lock.
+
+    partof:
+      - #SPC-notify-intercept
+      - #SPC-notify-intercept.threadsafe
     """
+    base_setattr = find_base_setattr(cls)
+
+    def confirm_write(self, attr_name, new_value):
+        current_value = stored_value(self, attr_name)
+        attr = cls.__name__ + "." + attr_name
+        user_resp = APPROVER(attr, current_value, new_value)
+        if user_resp == Response.YES:
+            no_problem_message()
+            base_setattr(self, attr_name, new_value)
+        elif user_resp == Response.NO:
+            angry_message()
 
     def new_setattr(self, attr_name, new_value):
         if attr_name not in var_names:
-            setattr(self, attr_name, new_value)
+            base_setattr(self, attr_name, new_value)
             return
         # The instance variable will be set for the first time during __init__ but we
         # don't want to prompt the user on instantiation.
-        if attr_name not in self.__dict__.keys():
-            setattr(self, attr_name, new_value)
+        if stored_value(self, attr_name) is UNSET:
+            base_setattr(self, attr_name, new_value)
             return
-        current_value = self.__dict__[attr_name]
-        attr = cls.__name__ + "." + attr_name
-        show_message(attr, current_value, new_value)
-        user_resp = prompt_user()
-        if user_resp == Response.YES:
-            no_problem_message()
-            setattr(self, attr_name, new_value)
-        elif user_resp == Response.NO:
-            angry_message()
+        if lock is None:
+            confirm_write(self, attr_name, new_value)
+            return
+        # Another thread may have changed the value while this one was waiting, so the
+        # current value is only read once the lock is held.
+        with lock:
+            confirm_write(self, attr_name, new_value)
 
+    new_setattr.marked_vars = var_names
     return new_setattr
 
 
+def stored_value(inst, attr_name):
+    """Returns the value stored for an attribute, or `UNSET` if it hasn't been set.
+
+    As in normal attribute lookup, a data descriptor on the class (a slot or a
+    property, say) comes first, then the instance's `__dict__`, then the class
+    variables. These are read directly, so that `__getattr__` is never called. A data
+    descriptor that raises `AttributeError`, like an empty slot, hasn't been set.
+
+    partof: #SPC-notify-intercept.slots
+    """
+    class_value = UNSET
+    for klass in type(inst).__mro__:
+        if attr_name in klass.__dict__:
+            class_value = klass.__dict__[attr_name]
+            break
+    if hasattr(type(class_value), "__set__"):
+        try:
+            return class_value.__get__(inst, type(inst))
+        except AttributeError:
+            return UNSET
+    try:
+        inst_dict = object.__getattribute__(inst, "__dict__")
+    except AttributeError:
+        inst_dict = dict()
+    return inst_dict.get(attr_name, class_value)
+
+
+def find_base_setattr(cls):
+    """Returns the `__setattr__` that actually stores values for instances of the class.
+
+    The `__setattr__` of a decorated base class is skipped: the subclass's replacement
+    already checks the base's marked variables, and the user shouldn't be asked twice.
+
+    partof: #SPC-notify-inst.mro
+    """
+    for klass in cls.__mro__[1:]:
+        base_setattr = klass.__dict__.get("__setattr__")
+        if base_setattr is None or hasattr(base_setattr, "marked_vars"):
+            continue
+        return base_setattr
+    return object.__setattr__
+
+
+def ask_user(name, old_value, new_value):
+    """Show the message and prompt the user at this process's terminal.
+
+    partof: #SPC-notify-intercept.approver
+    """
+    show_message(name, old_value, new_value)
+    return prompt_user()
+
+
+APPROVER = ask_user
+
+
+def set_approver(approver):
+    """Replace the function that decides whether a marked write goes ahead.
+
+    The approver is called with the qualified attribute name, the current value, and
+    the new value, and must return a `Response`. Passing `None` restores the default
+    of asking the user at this process's terminal.
+
+    partof: #SPC-notify-intercept.approver
+    """
+    global APPROVER
+    APPROVER = ask_user if approver is None else approver
+
+
+class ValueRepr(reprlib.Repr):
+
+    """
+    `reprlib.Repr` that shortens `bytes` and `bytearray` before formatting them, and
+    summarizes large objects of other types instead of formatting them.
+
+    partof: #SPC-notify-intercept.render
+
+    """
+
+    def repr_bytes(self, value, level):
+        text = repr(value[: self.maxstring])
+        if len(value) > self.maxstring:
+            text += "..."
+        return text
+
+    def repr_bytearray(self, value, level):
+        return self.repr_bytes(value, level)
+
+    def repr_instance(self, value, level):
+        summary = summarize(value, self.maxother)
+        if summary is None:
+            return super().repr_instance(value, level)
+        return summary
+
+
+VALUE_REPR = ValueRepr()
+
+
+def set_value_budget(chars):
+    """Set the most characters of a value that are shown in a message.
+
+    partof: #SPC-notify-intercept.render
+    """
+    global VALUE_BUDGET
+    if type(chars) is not int or chars < 4:
+        raise ValueError("The budget must be an integer of at least 4")
+    VALUE_BUDGET = chars
+    VALUE_REPR.maxstring = chars
+    VALUE_REPR.maxlong = chars
+    VALUE_REPR.maxother = chars
+    # No more items than characters can be shown, so the containers are only cut at
+    # the budget and the final cut in `render_value` does the rest
+    for limit in ("list", "tuple", "set", "frozenset", "dict", "deque", "array"):
+        setattr(VALUE_REPR, "max" + limit, chars)
+
+
+set_value_budget(VALUE_BUDGET)
+
+
+def summarize(value, limit):
+    """Returns `<type of length n>` for a value with more than `limit` items, or `None`.
+    """
+    try:
+        size = len(value)
+    except TypeError:
+        return None
+    if size > limit:
+        return f"<{type(value).__name__} of length {size}>"
+    return None
+
+
+def render_value(value):
+    """Render a value for a message in at most `VALUE_BUDGET` characters.
+
+    Strings are shown as they are. Builtin containers, strings nested in them, and
+    bytes are shortened `reprlib`-style before they're formatted. Other objects that
+    have more items than the budget has characters are summarized by their type and
+    length without formatting them at all.
+
+    partof: #SPC-notify-intercept.render
+    """
+    if type(value) is str:
+        text = value[: VALUE_BUDGET + 1]
+    elif hasattr(VALUE_REPR, "repr_" + type(value).__name__.replace(" ", "_")):
+        text = VALUE_REPR.repr(value)
+    else:
+        text = summarize(value, VALUE_BUDGET)
+        if text is None:
+            text = str(value)
+    if len(text) > VALUE_BUDGET:
+        text = text[: VALUE_BUDGET - 3] + "..."
+    return text
+
+
 def show_message(name, old_value, new_value):
     """Inform the user that a new value is about to be set.
 
+    The values are only rendered here, so writes decided by another approver never
+    pay for formatting them.
+
     partof: #SPC-notify-intercept.msg
     """
     update_msg = f"It looks like you're trying to update {name}"
-    from_msg = f'from "{old_value}"'
-    to_msg = f'to "{new_value}".'
+    from_msg = f'from "{render_value(old_value)}"'
+    to_msg = f'to "{render_value(new_value)}".'
     use_combined = False
     if len(from_msg + to_msg) < 60:
         combined_msg = from_msg + " " + to_msg
@@ -0,0 +1,200 @@
+"""#SPC-scan"""
+import ast
+import sys
+
+from annotation_abuse.asts import MacroItem, extract_endpoints, parse
+from annotation_abuse.notify import MARKER, marked_instvars
+
+DECORATORS = ["inrange", "notify"]
+STMT_FIELDS = ["body", "orelse", "handlers", "finalbody"]
+
+# Maps `(filename, qualname)` to the `ClassEntry` for a decorated class. A value of
+# `None` means that more than one class in the file has that qualified name.
+REGISTRY = dict()
+# Maps `(filename, lineno)` to the marked instance variables assigned by the `__init__`
+# defined on that line, for every `__init__` in every scanned file.
+INITS = dict()
+SCANNED = set()
+
+
+class ClassEntry:
+
+    """
+    Metadata precomputed for a single decorated class.
+
+    partof: #SPC-scan.entry
+
+    """
+
+    __slots__ = ("qualname", "init_lineno", "classvars", "ranges")
+
+    def __init__(self, qualname):
+        self.qualname = qualname
+        self.init_lineno = None
+        self.classvars = []
+        # Maps the variable name to `(annotation, lower, upper)`
+        self.ranges = dict()
+
+    def describes(self, cls):
+        """Returns `True` if the entry still matches the class being decorated."""
+        annotations = cls.__dict__.get("__annotations__", {})
+        for var in self.classvars:
+            if annotations.get(var) != MARKER:
+                return False
+        init = cls.__dict__.get("__init__")
+        if init is None:
+            return self.init_lineno is None
+        try:
+            return init.__code__.co_firstlineno == self.init_lineno
+        except AttributeError:
+            return False
+
+    def has_range(self, item):
+        """Returns `True` if the endpoints for the `MacroItem` were precomputed."""
+        try:
+            return self.ranges[item.var][0] == item.annotation
+        except KeyError:
+            return False
+
+
+def is_macro(node):
+    """Returns `True` if a decorator node applies `inrange` or `notify`."""
+    if type(node) is ast.Call:
+        node = node.func
+    if type(node) is ast.Name:
+        return node.id in DECORATORS
+    if type(node) is ast.Attribute:
+        return node.attr in DECORATORS
+    return False
+
+
+def child_stmts(node):
+    """Yields the statements nested directly inside a statement."""
+    for field in STMT_FIELDS:
+        for child in getattr(node, field, []):
+            yield child
+
+
+def build_entry(class_node, qualname):
+    """Precompute the metadata for a decorated class.
+
+    partof: #SPC-scan.entry
+    """
+    entry = ClassEntry(qualname)
+    stmts = list(child_stmts(class_node))
+    while stmts:
+        stmt = stmts.pop(0)
+        if type(stmt) is ast.FunctionDef and stmt.name == "__init__":
+            entry.init_lineno = stmt.lineno
+            continue
+        if type(stmt) in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+            continue
+        if type(stmt) is not ast.AnnAssign:
+            stmts = list(child_stmts(stmt)) + stmts
+            continue
+        if type(stmt.target) is not ast.Name or type(stmt.annotation) is not ast.Str:
+            continue
+        var, annotation = stmt.target.id, stmt.annotation.s
+        if annotation == MARKER:
+            entry.classvars.append(var)
+            continue
+        try:
+            lower, upper = extract_endpoints(parse(MacroItem(var, annotation)))
+        except Exception:
+            # Not every string annotation is a range. If it was meant to be one, the
+            # decorator will report the problem when it parses the annotation itself.
+            continue
+        entry.ranges[var] = (annotation, lower, upper)
+    return entry
+
+
+def find_classes(node, prefix, entries, inits):
+    """Recursively collect entries for the decorated classes below `node`.
+
+    The keys of `entries` are the `__qualname__`s that the classes will have at runtime.
+    The marked instance variables of every `__init__` found along the way are stored in
+    `inits` by line number.
+
+    partof: #SPC-scan.walk
+    """
+    for child in child_stmts(node):
+        if type(child) is ast.ClassDef:
+            qualname = prefix + child.name
+            if any(is_macro(dec) for dec in child.decorator_list):
+                if qualname in entries:
+                    entries[qualname] = None
+                else:
+                    entries[qualname] = build_entry(child, qualname)
+            find_classes(child, qualname + ".", entries, inits)
+        elif type(child) in (ast.FunctionDef, ast.AsyncFunctionDef):
+            if child.name == "__init__":
+                inits[child.lineno] = marked_instvars(child)
+            find_classes(child, prefix + child.name + ".<locals>.", entries, inits)
+        else:
+            find_classes(child, prefix, entries, inits)
+    return entries
+
+
+def scan_source(source, filename):
+    """Scan the source of a module and register every decorated class in it.
+
+    partof: #SPC-scan.walk
+    """
+    mod_node = ast.parse(source)
+    inits = dict()
+    entries = find_classes(mod_node, "", dict(), inits)
+    for lineno, instvars in inits.items():
+        INITS[(filename, lineno)] = instvars
+    for qualname, entry in entries.items():
+        REGISTRY[(filename, qualname)] = entry
+    SCANNED.add(filename)
+    return entries
+
+
+def scan_file(filename):
+    """Scan a source file once, registering every decorated class in it.
+
+    Files that can't be read or parsed are recorded as scanned with no entries, so the
+    decorators fall back to analyzing each class on its own.
+
+    partof: #SPC-scan.walk
+    """
+    if filename in SCANNED:
+        return
+    try:
+        with open(filename, "r") as mod_file:
+            source = mod_file.read()
+        scan_source(source, filename)
+    except (IOError, SyntaxError, ValueError):
+        SCANNED.add(filename)
+
+
+def scan_module(module):
+    """Scan the source file of an imported module.
+
+    partof: #SPC-scan.walk
+    """
+    filename = getattr(module, "__file__", None)
+    if filename is not None:
+        scan_file(filename)
+
+
+def source_file(cls):
+    """Returns the filename of the module that the class is defined in."""
+    module = sys.modules.get(cls.__module__)
+    return getattr(module, "__file__", None)
+
+
+def lookup(cls, scan=False):
+    """Returns the precomputed entry for a class, or `None` if there isn't one.
+
+    When `scan` is `True` the class's module is scanned first if it hasn't been already.
+
+    partof: #SPC-scan.lookup
+    """
+    filename = source_file(cls)
+    if filename is None:
+        return None
+    if scan:
+        scan_file(filename)
+    return REGISTRY.get((filename, cls.__qualname__))
@@ -0,0 +1,126 @@
+"""Measure how quickly `@inrange` instances are pickled and sent to worker processes.
+
+`Reading` is pickled the default way (the instance `__dict__`) and revalidated by the
+generated `__setstate__`, which `TrustedReading` doesn't have. `CompactReading` is
+pickled as a tuple of its values with `compact=True`, and `TrustedCompactReading` also
+skips the range checks when unpickling. `PlainReading` has the generated
+`__setstate__` and copy methods removed, as a baseline. For each class the pickled
+size, the time to pickle and unpickle a batch, and the throughput of sending batches
+through a `ProcessPoolExecutor` are reported as JSON.
+
+    python -m benchmarks.bench_inrange_pickle --instances 100000
+"""
+import argparse
+import json
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from annotation_abuse.asts import inrange
+
+GENERATED = ["__setstate__", "__copy__", "__deepcopy__"]
+
+
+@inrange
+class PlainReading:
+    temperature: "-50 < temperature < 150"
+    humidity: "0 < humidity < 100"
+    pressure: "800 < pressure < 1200"
+
+
+for method in GENERATED:
+    delattr(PlainReading, method)
+
+
+@inrange
+class Reading:
+    temperature: "-50 < temperature < 150"
+    humidity: "0 < humidity < 100"
+    pressure: "800 < pressure < 1200"
+
+
+@inrange(revalidate=False)
+class TrustedReading:
+    temperature: "-50 < temperature < 150"
+    humidity: "0 < humidity < 100"
+    pressure: "800 < pressure < 1200"
+
+
+@inrange(compact=True)
+class CompactReading:
+    temperature: "-50 < temperature < 150"
+    humidity: "0 < humidity < 100"
+    pressure: "800 < pressure < 1200"
+
+
+@inrange(compact=True, revalidate=False)
+class TrustedCompactReading:
+    temperature: "-50 < temperature < 150"
+    humidity: "0 < humidity < 100"
+    pressure: "800 < pressure < 1200"
+
+
+def make_batch(cls, n_instances):
+    records = ((20 + i % 50, 1 + i % 90, 900 + i % 200) for i in range(n_instances))
+    return list(cls.from_records(records))
+
+
+def count(batch):
+    return len(batch)
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_class(cls, n_instances, chunk_size, repeat, pool):
+    batch = make_batch(cls, n_instances)
+    data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+    chunks = [batch[i : i + chunk_size] for i in range(0, n_instances, chunk_size)]
+
+    def send():
+        return sum(pool.map(count, chunks))
+
+    return {
+        "class": cls.__name__,
+        "instances": n_instances,
+        "bytes_per_instance": len(data) / n_instances,
+        "dumps_seconds": best_of(
+            lambda: pickle.dumps(batch, pickle.HIGHEST_PROTOCOL), repeat
+        ),
+        "loads_seconds": best_of(lambda: pickle.loads(data), repeat),
+        "ipc_instances_per_second": n_instances / best_of(send, repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        classes = [
+            PlainReading,
+            Reading,
+            TrustedReading,
+            CompactReading,
+            TrustedCompactReading,
+        ]
+        for cls in classes:
+            results.append(
+                bench_class(cls, args.instances, args.chunk_size, args.repeat, pool)
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
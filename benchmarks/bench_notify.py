@@ -0,0 +1,214 @@
+"""Benchmark the cost of decorating classes with `@notify` and of intercepting writes.
+
+Three groups of measurements are made:
+
+- decoration: `module_ast`, `build_func_cache`, `find_instvars`, and the whole
+  decorator, for generated modules of different sizes and nesting depths.
+- write: the cost of a write through the generated `__setattr__` for marked,
+  unmarked, and first-time (`__init__`) writes, next to an undecorated class.
+- notification: the end-to-end cost of a marked write that prints the full message,
+  with stdout redirected.
+
+The prompt is stubbed out so the suite runs without a terminal. Results are printed as
+JSON, or written to a file with `--output`.
+
+    python -m benchmarks.bench_notify --output bench_output.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import timeit
+
+import annotation_abuse.notify as notify_mod
+import annotation_abuse.scan as scan_mod
+from annotation_abuse.notify import (
+    Response,
+    build_func_cache,
+    find_instvars,
+    module_ast,
+    notify,
+    set_approver,
+)
+
+FILLER = """
+def filler_{i}(x):
+    if x > {i}:
+        return x - {i}
+    return x + {i}
+"""
+TARGET = """
+class Target(object):
+    def __init__(self):
+        self.var: "this one" = 1
+        self.other = 1
+"""
+
+
+def module_source(n_funcs, depth):
+    """Module source with `n_funcs` functions and `Target` nested in `depth` more."""
+    lines = TARGET.strip("\n").splitlines() + ["return Target"]
+    for level in reversed(range(depth)):
+        body = ["    " + line for line in lines]
+        lines = [f"def make_{level}():"] + body + [f"return make_{level}()"]
+    # The last line is at module level now
+    lines[-1] = lines[-1].replace("return ", "TARGET = ")
+    fillers = [FILLER.format(i=i) for i in range(n_funcs)]
+    return "".join(fillers) + "\n" + "\n".join(lines) + "\n"
+
+
+def load_module(directory, name, source):
+    path = os.path.join(directory, name + ".py")
+    with open(path, "w") as mod_file:
+        mod_file.write(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(func, number, repeat):
+    """The fastest time per call of `func` over `repeat` runs of `number` calls."""
+    times = timeit.Timer(func).repeat(repeat=repeat, number=number)
+    return min(times) / number
+
+
+def forget_scan(module):
+    """Forget everything remembered about a module so it gets analyzed again.
+
+    The scanner's tables and the marked variables remembered for each `__init__` are
+    all keyed by filename first.
+    """
+    filename = module.__file__
+    scan_mod.SCANNED.discard(filename)
+    for table in (scan_mod.REGISTRY, scan_mod.INITS, notify_mod.INIT_VARS):
+        for key in [key for key in table if key[0] == filename]:
+            del table[key]
+
+
+def bench_decoration(directory, sizes, depths, repeat):
+    results = []
+    for n_funcs in sizes:
+        for depth in depths:
+            name = f"bench_mod_{n_funcs}_{depth}"
+            module = load_module(directory, name, module_source(n_funcs, depth))
+            cls = module.TARGET
+            mod_ast = module_ast(cls)
+
+            def analyze():
+                forget_scan(module)
+                find_instvars(cls)
+
+            def decorate():
+                forget_scan(module)
+                notify(cls)
+
+            timings = {
+                "module_ast": best_of(lambda: module_ast(cls), 1, repeat),
+                "build_func_cache": best_of(
+                    lambda: build_func_cache(mod_ast), 1, repeat
+                ),
+                "find_instvars": best_of(analyze, 1, repeat),
+                "notify": best_of(decorate, 1, repeat),
+            }
+            for func_name, seconds in timings.items():
+                results.append(
+                    {
+                        "group": "decoration",
+                        "name": func_name,
+                        "functions": n_funcs,
+                        "depth": depth,
+                        "seconds": seconds,
+                    }
+                )
+    return results
+
+
+class Undecorated(object):
+    def __init__(self):
+        self.var: "this one" = 1
+        self.other = 1
+
+
+@notify
+class Decorated(object):
+    def __init__(self):
+        self.var: "this one" = 1
+        self.other = 1
+
+
+def bench_writes(number, repeat):
+    plain = Undecorated()
+    decorated = Decorated()
+
+    def write_plain():
+        plain.other = 2
+
+    def write_unmarked():
+        decorated.other = 2
+
+    def write_marked():
+        decorated.var = 2
+
+    set_approver(lambda name, old_value, new_value: Response.YES)
+    no_problem_message = notify_mod.no_problem_message
+    notify_mod.no_problem_message = lambda: None
+    try:
+        timings = {
+            "undecorated": best_of(write_plain, number, repeat),
+            "unmarked": best_of(write_unmarked, number, repeat),
+            "marked": best_of(write_marked, number, repeat),
+            "undecorated_init": best_of(Undecorated, number, repeat),
+            "first_init": best_of(Decorated, number, repeat),
+        }
+    finally:
+        set_approver(None)
+        notify_mod.no_problem_message = no_problem_message
+    return [
+        {"group": "write", "name": name, "seconds": seconds}
+        for name, seconds in timings.items()
+    ]
+
+
+def bench_notification(number, repeat):
+    decorated = Decorated()
+
+    def write_marked():
+        decorated.var = 2
+
+    prompt_user = notify_mod.prompt_user
+    notify_mod.prompt_user = lambda: Response.YES
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = best_of(write_marked, number, repeat)
+    finally:
+        notify_mod.prompt_user = prompt_user
+    return [{"group": "notification", "name": "marked_write", "seconds": seconds}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--number", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = bench_decoration(directory, args.sizes, args.depths, args.repeat)
+    results += bench_writes(args.number, args.repeat)
+    results += bench_notification(args.number, args.repeat)
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as out_file:
+            out_file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
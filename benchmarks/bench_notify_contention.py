@@ -0,0 +1,91 @@
+"""Measure how `@notify(threadsafe=True)` behaves under contention.
+
+Each scenario starts a number of threads that hammer a single instance and reports
+the wall-clock time per write as JSON. The prompt is stubbed out so the benchmark can
+run without a terminal.
+
+    python -m benchmarks.bench_notify_contention --threads 8 --writes 2000
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+
+import annotation_abuse.notify as notify_mod
+from annotation_abuse.notify import notify, Response
+
+
+def make_class(threadsafe):
+    class Contended(object):
+        def __init__(self):
+            self.marked: "this one" = 0
+            self.unmarked = 0
+
+    return notify(Contended, threadsafe=threadsafe)
+
+
+def run_threads(n_threads, n_writes, work):
+    start = threading.Barrier(n_threads + 1)
+
+    def worker(offset):
+        start.wait()
+        for i in range(n_writes):
+            work(offset + i)
+
+    threads = [
+        threading.Thread(target=worker, args=(t * n_writes,)) for t in range(n_threads)
+    ]
+    for t in threads:
+        t.start()
+    start.wait()
+    begin = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    return elapsed / (n_threads * n_writes)
+
+
+def scenarios(threadsafe):
+    cls = make_class(threadsafe)
+    inst = cls()
+
+    def unmarked(value):
+        inst.unmarked = value
+
+    def marked(value):
+        inst.marked = value
+
+    def first_init(value):
+        cls()
+
+    return [("unmarked", unmarked), ("marked", marked), ("first_init", first_init)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=2000)
+    args = parser.parse_args()
+
+    notify_mod.prompt_user = lambda: Response.YES
+    results = []
+    for threadsafe in (False, True):
+        for name, work in scenarios(threadsafe):
+            with contextlib.redirect_stdout(io.StringIO()):
+                per_write = run_threads(args.threads, args.writes, work)
+            results.append(
+                {
+                    "scenario": name,
+                    "threadsafe": threadsafe,
+                    "threads": args.threads,
+                    "writes_per_thread": args.writes,
+                    "seconds_per_write": per_write,
+                }
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
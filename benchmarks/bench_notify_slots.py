@@ -0,0 +1,77 @@
+"""Measure the memory used per instance of slotted and regular `@notify` classes.
+
+Reports the bytes allocated per instance as JSON, measured with `tracemalloc`.
+
+    python -m benchmarks.bench_notify_slots --instances 100000
+"""
+import argparse
+import json
+import tracemalloc
+
+from annotation_abuse.notify import notify
+
+
+class Plain(object):
+    def __init__(self, x):
+        self.x: "this one" = x
+        self.y = x
+
+
+class Slotted(object):
+    __slots__ = ("x", "y")
+
+    def __init__(self, x):
+        self.x: "this one" = x
+        self.y = x
+
+
+@notify
+class PlainNotify(object):
+    def __init__(self, x):
+        self.x: "this one" = x
+        self.y = x
+
+
+@notify
+class SlottedNotify(object):
+    __slots__ = ("x", "y")
+
+    def __init__(self, x):
+        self.x: "this one" = x
+        self.y = x
+
+
+def bytes_per_instance(cls, n_instances):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    instances = [cls(i) for i in range(n_instances)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    total = sum(stat.size_diff for stat in stats)
+    # Don't count the list holding the instances
+    total -= instances.__sizeof__()
+    return total / n_instances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = []
+    for cls in (Plain, PlainNotify, Slotted, SlottedNotify):
+        results.append(
+            {
+                "class": cls.__name__,
+                "slotted": hasattr(cls, "__slots__"),
+                "decorated": cls.__name__.endswith("Notify"),
+                "instances": args.instances,
+                "bytes_per_instance": bytes_per_instance(cls, args.instances),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
+import copy
+import gc
 import hypothesis.strategies as st
+import itertools
+import pickle
+import weakref
 
 from ast import Compare
 from math import isinf, isnan
@@ -6,14 +11,64 @@ from typing import List
 from annotation_abuse.asts import (
     inrange,
     MacroError,
+    FrozenInstanceError,
+    Field,
     collect_vars,
     parse,
     extract_endpoints,
+    populate_macro_items,
 )
 from hypothesis import given, assume
 from pytest import raises
 
 
+@inrange
+class PickledClass:
+    var1: "0 < var1 < 1"
+    var2: "-5 < var2 < 5"
+
+
+@inrange(frozen=True)
+class PickledFrozenClass:
+    var1: "0 < var1 < 1"
+    var2: "-5 < var2 < 5"
+
+
+@inrange(revalidate=False)
+class TrustedClass:
+    var: "0 < var < 1"
+
+
+@inrange
+class PickledSlottedClass:
+    __slots__ = ("_var",)
+    var: "0 < var < 1"
+
+
+class PickledSubclass(PickledClass):
+    def __init__(self, extra):
+        super().__init__()
+        self.extra = extra
+
+
+@inrange(compact=True)
+class CompactClass:
+    var1: "0 < var1 < 1"
+    var2: "-5 < var2 < 5"
+
+
+@inrange(frozen=True, compact=True)
+class CompactFrozenClass:
+    var1: "0 < var1 < 1"
+    var2: "-5 < var2 < 5"
+
+
+class CompactSubclass(CompactClass):
+    def __init__(self, extra):
+        super().__init__()
+        self.extra = extra
+
+
 sorted_int_endpoints = st.tuples(st.integers(), st.integers()).map(sorted)
 sorted_float_endpoints = st.tuples(st.floats(), st.floats()).map(sorted)
 
@@ -207,6 +262,65 @@ def test_rejects_outside_range():
         dummy.var = 2
 
 
+def test_accessor_code_is_shared():
+    """#SPC-asts.tst-intern"""
+
+    @inrange
+    class FirstClass:
+        ratio: "0 < ratio < 1"
+
+    @inrange
+    class SecondClass:
+        ratio: "0 < ratio < 1"
+
+    @inrange
+    class FloatClass:
+        ratio: "0 < ratio < 1.0"
+
+    first, second = FirstClass.ratio, SecondClass.ratio
+    assert first.fget is not second.fget
+    assert first.fget.__code__ is second.fget.__code__
+    assert first.fset.__code__ is second.fset.__code__
+    assert FloatClass.ratio.fset.__code__ is not first.fset.__code__
+    dummy = SecondClass()
+    with raises(ValueError):
+        dummy.ratio = 1
+
+
+def test_field_table(mocker):
+    """#SPC-asts.tst-fields"""
+    refs = []
+
+    def track_items(cls):
+        items = populate_macro_items(cls)
+        refs.extend(weakref.ref(item) for item in items)
+        return items
+
+    mocker.patch("annotation_abuse.asts.populate_macro_items", track_items)
+
+    @inrange
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "-5 < var2 < 5.5"
+
+    @inrange(frozen=True)
+    class FrozenClass:
+        var: "0 < var < 1"
+
+    fields = DummyClass.__inrange_fields__
+    assert list(fields) == ["var1", "var2"]
+    assert fields["var2"] == Field("var2", -5, 5.5)
+    assert fields["var2"].upper == 5.5
+    assert FrozenClass.__inrange_fields__["var"] == ("var", 0, 1)
+    with raises(TypeError):
+        fields["var1"] = Field("var1", 0, 2)
+    with raises(AttributeError):
+        fields["var1"].lower = -1
+    gc.collect()
+    assert len(refs) == 3
+    assert all(ref() is None for ref in refs)
+
+
 def test_init_stmts_added():
     """#SPC-asts.tst-init_stmts"""
 
@@ -218,3 +332,286 @@ def test_init_stmts_added():
     assert dummy._var is None
     dummy.var = 1
     assert dummy._var == 1
+
+
+def test_instances_are_independent():
+    """#SPC-asts.tst-init_stmts"""
+
+    @inrange
+    class DummyClass:
+        var: "0 < var < 2"
+
+    first = DummyClass()
+    second = DummyClass()
+    first.var = 1
+    assert second.var is None
+
+
+def test_update_is_atomic():
+    """#SPC-asts.tst-update"""
+
+    @inrange
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "0 < var2 < 2"
+        var3: "0 < var3 < 3"
+
+    dummy = DummyClass()
+    dummy.update(var1=0.5, var3=2)
+    assert (dummy.var1, dummy.var2, dummy.var3) == (0.5, None, 2)
+    with raises(ValueError):
+        dummy.update(var1=0.25, var2=1, var3=5)
+    assert (dummy.var1, dummy.var2, dummy.var3) == (0.5, None, 2)
+    with raises(TypeError):
+        dummy.update(missing=1)
+
+
+def test_from_records_accepts_tuples_and_dicts():
+    """#SPC-asts.tst-records"""
+
+    @inrange
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "-5 < var2 < 5"
+
+    records = [(0.5, 1), {"var2": -1, "var1": 0.25, "extra": None}]
+    built = list(DummyClass.from_records(records))
+    assert [(d.var1, d.var2) for d in built] == [(0.5, 1), (0.25, -1)]
+    assert all(type(d) is DummyClass for d in built)
+
+
+def test_from_records_error_handling():
+    """#SPC-asts.tst-records_errors"""
+
+    @inrange
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "-5 < var2 < 5"
+
+    records = [(0.5, 1), (2, 1), {"var1": 0.5}, (0.5,), (0.5, 2)]
+    with raises(ValueError, match="outside of range"):
+        list(DummyClass.from_records(records))
+    skipped = list(DummyClass.from_records(records, on_error="skip"))
+    assert [d.var2 for d in skipped] == [1, 2]
+    errors = []
+    collected = list(DummyClass.from_records(records, on_error=errors))
+    assert len(collected) == 2
+    assert [rec for rec, _ in errors] == [(2, 1), {"var1": 0.5}, (0.5,)]
+    assert [type(err) for _, err in errors] == [ValueError, KeyError, ValueError]
+    with raises(ValueError, match="on_error"):
+        list(DummyClass.from_records(records, on_error="ignore"))
+
+
+def test_from_records_is_lazy():
+    """#SPC-asts.tst-records"""
+
+    @inrange
+    class DummyClass:
+        var: "0 < var < 1"
+
+    endless = ((0.5,) for _ in itertools.count())
+    first_three = list(itertools.islice(DummyClass.from_records(endless), 3))
+    assert len(first_three) == 3
+
+
+def test_frozen_validates_once():
+    """#SPC-asts.tst-frozen"""
+
+    @inrange(frozen=True)
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "-5 < var2 < 5"
+
+    dummy = DummyClass(0.5, var2=-1)
+    assert (dummy.var1, dummy.var2) == (0.5, -1)
+    assert not hasattr(dummy, "__dict__")
+    with raises(ValueError):
+        DummyClass(2, 0)
+    with raises(FrozenInstanceError):
+        dummy.var1 = 0.25
+    with raises(FrozenInstanceError):
+        dummy._var1 = 0.25
+    with raises(FrozenInstanceError):
+        del dummy.var2
+    assert dummy.var1 == 0.5
+
+
+def test_frozen_methods_use_new_class():
+    """#SPC-asts.tst-frozen"""
+
+    class Base:
+        def describe(self):
+            return "base"
+
+    @inrange(frozen=True)
+    class DummyClass(Base):
+        var: "0 < var < 1"
+
+        def describe(self):
+            return "dummy " + super().describe()
+
+        def same(self):
+            return __class__(self.var)
+
+        @classmethod
+        def make(cls):
+            return super().__new__(cls)
+
+        @property
+        def label(self):
+            return super().describe()
+
+    dummy = DummyClass(0.5)
+    assert dummy.describe() == "dummy base"
+    assert dummy.same() == dummy
+    assert dummy.label == "base"
+    assert type(DummyClass.make()) is DummyClass
+
+
+def test_frozen_is_hashable():
+    """#SPC-asts.tst-frozen_hash"""
+
+    @inrange(frozen=True)
+    class DummyClass:
+        var1: "0 < var1 < 1"
+        var2: "-5 < var2 < 5"
+
+    first = DummyClass(0.5, 1)
+    same = DummyClass(0.5, 1)
+    different = DummyClass(0.5, 2)
+    assert first == same
+    assert first != different
+    assert first != (0.5, 1)
+    assert hash(first) == hash(same)
+    lookup = {first: "found"}
+    assert lookup[same] == "found"
+    assert len({first, same, different}) == 2
+
+
+def test_frozen_field_named_hash():
+    """#SPC-asts.tst-frozen_hash"""
+
+    @inrange(frozen=True)
+    class DummyClass:
+        hash: "0 < hash < 10"
+        var: "0 < var < 1"
+
+    first = DummyClass(5, 0.5)
+    assert (first.hash, first.var) == (5, 0.5)
+    assert hash(first) == hash(DummyClass(5, 0.5))
+    assert first != DummyClass(6, 0.5)
+    with raises(ValueError):
+        DummyClass(11, 0.5)
+    with raises(MacroError):
+
+        @inrange(frozen=True)
+        class ReservedClass:
+            object_setattr: "0 < object_setattr < 1"
+
+
+def test_frozen_from_records():
+    """#SPC-asts.tst-frozen"""
+
+    @inrange(frozen=True)
+    class DummyClass:
+        var: "0 < var < 1"
+
+    built = list(DummyClass.from_records([(0.5,), (2,)], on_error="skip"))
+    assert built == [DummyClass(0.5)]
+    assert hash(built[0]) == hash(DummyClass(0.5))
+
+
+def test_pickle_roundtrip():
+    """#SPC-asts.tst-pickle"""
+    for cls in (PickledClass, CompactClass):
+        dummy = cls()
+        dummy.var1, dummy.var2 = 0.5, -1
+        restored = pickle.loads(pickle.dumps(dummy))
+        assert type(restored) is cls
+        assert (restored.var1, restored.var2) == (0.5, -1)
+    assert dummy.__getstate__() == (0.5, -1)
+    for cls in (PickledFrozenClass, CompactFrozenClass):
+        frozen = cls(0.5, -1)
+        restored = pickle.loads(pickle.dumps(frozen))
+        assert restored == frozen
+        assert hash(restored) == hash(frozen)
+    slotted = PickledSlottedClass()
+    slotted.var = 0.5
+    assert pickle.loads(pickle.dumps(slotted)).var == 0.5
+
+
+def test_compact_pickles_are_smaller():
+    """#SPC-asts.tst-pickle"""
+    default, compact = PickledClass(), CompactClass()
+    default.var1 = compact.var1 = 0.5
+    default.var2 = compact.var2 = -1
+    # The class names have the same length
+    assert len(pickle.dumps(compact)) < len(pickle.dumps(default))
+
+
+def test_setstate_revalidates():
+    """#SPC-asts.tst-pickle"""
+    dummy = PickledClass.__new__(PickledClass)
+    with raises(ValueError):
+        dummy.__setstate__({"_var1": 2, "_var2": 0})
+    compact = CompactClass.__new__(CompactClass)
+    with raises(ValueError):
+        compact.__setstate__((2, 0))
+    frozen = PickledFrozenClass.__new__(PickledFrozenClass)
+    with raises(ValueError):
+        frozen.__setstate__((None, {"_var1": 0.5, "_var2": 10}))
+    frozen = CompactFrozenClass.__new__(CompactFrozenClass)
+    with raises(ValueError):
+        frozen.__setstate__((0.5, 10))
+    slotted = PickledSlottedClass.__new__(PickledSlottedClass)
+    with raises(ValueError):
+        slotted.__setstate__((None, {"_var": 2}))
+    for cls in (PickledClass, CompactClass):
+        unset = pickle.loads(pickle.dumps(cls()))
+        assert unset.var1 is None
+    trusted = TrustedClass()
+    trusted._var = 2
+    assert pickle.loads(pickle.dumps(trusted)).var == 2
+
+
+def test_extra_attributes_are_kept():
+    """#SPC-asts.tst-pickle"""
+    for cls, subclass in [
+        (PickledClass, PickledSubclass),
+        (CompactClass, CompactSubclass),
+    ]:
+        dummy = cls()
+        dummy.var1 = 0.5
+        dummy.label = "x"
+        sub = subclass([1, 2])
+        sub.var2 = -1
+        for original in (dummy, sub):
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                restored = pickle.loads(pickle.dumps(original, protocol))
+                assert type(restored) is type(original)
+                assert restored.__dict__ == original.__dict__
+            for copied in (copy.copy(original), copy.deepcopy(original)):
+                assert copied.__dict__ == original.__dict__
+        assert copy.copy(sub).extra is sub.extra
+        assert copy.deepcopy(sub).extra is not sub.extra
+    assert dummy.__getstate__() == (0.5, None, {"label": "x"})
+    with raises(ValueError):
+        PickledSubclass.__new__(PickledSubclass).__setstate__(
+            {"_var1": 2, "_var2": 0, "extra": 1}
+        )
+    with raises(ValueError):
+        CompactSubclass.__new__(CompactSubclass).__setstate__((2, 0, {"extra": 1}))
+
+
+def test_copies():
+    """#SPC-asts.tst-copy"""
+    dummy = PickledClass()
+    dummy.var1, dummy.var2 = 0.5, -1
+    for copied in (copy.copy(dummy), copy.deepcopy(dummy)):
+        assert copied is not dummy
+        assert (copied.var1, copied.var2) == (0.5, -1)
+        copied.var1 = 0.25
+        assert dummy.var1 == 0.5
+    frozen = PickledFrozenClass(0.5, -1)
+    assert copy.copy(frozen) is frozen
+    assert copy.deepcopy(frozen) is frozen
@@ -0,0 +1,95 @@
+import multiprocessing
+
+from multiprocessing import Pipe
+from annotation_abuse.broker import ApprovalBroker, connect
+from annotation_abuse.notify import notify, Response, PROMPT_LOCK
+
+
+@notify
+class BrokerDummy(object):
+    def __init__(self):
+        self.var: "this one" = 1
+
+
+def write_in_worker(value):
+    dummy = BrokerDummy()
+    dummy.var = value
+    return dummy.var
+
+
+def test_broker_answers_workers(mocker):
+    """#SPC-broker.tst-worker"""
+    shown = []
+    mocker.patch(
+        "annotation_abuse.notify.show_message", lambda *args: shown.append(args)
+    )
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.YES)
+    ctx = multiprocessing.get_context("fork")
+    with ApprovalBroker() as broker:
+        with ctx.Pool(1, initializer=connect, initargs=broker.worker_args) as pool:
+            result = pool.apply(write_in_worker, (2,))
+    assert result == 2
+    # The message was shown by the parent, not by the worker
+    assert shown == [("BrokerDummy.var", "1", "2")]
+
+
+def test_broker_rejects_for_workers(mocker):
+    """#SPC-broker.tst-worker"""
+    mocker.patch("annotation_abuse.notify.show_message", lambda *args: None)
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+    ctx = multiprocessing.get_context("fork")
+    with ApprovalBroker() as broker:
+        with ctx.Pool(1, initializer=connect, initargs=broker.worker_args) as pool:
+            result = pool.apply(write_in_worker, (2,))
+    assert result == 1
+
+
+def test_broker_prompts_once_per_batch(mocker):
+    """#SPC-broker.tst-batch"""
+    prompts = []
+    mocker.patch("annotation_abuse.notify.show_message", lambda *args: None)
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: prompts.append(1) or Response.YES,
+    )
+    broker = ApprovalBroker()
+    pipes = [Pipe() for _ in range(3)]
+    batch = [
+        (parent, (f"Dummy.var{i}", "0", "1")) for i, (parent, _) in enumerate(pipes)
+    ]
+    assert broker.answer(batch) == Response.YES
+    assert len(prompts) == 1
+    for _, child in pipes:
+        assert child.recv() == "YES"
+
+
+def test_broker_coalesces_duplicates(mocker):
+    """#SPC-broker.tst-batch"""
+    shown = []
+    mocker.patch(
+        "annotation_abuse.notify.show_message", lambda *args: shown.append(args)
+    )
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+    broker = ApprovalBroker()
+    pipes = [Pipe() for _ in range(3)]
+    requests = [("Dummy.var", "0", "1")] * 2 + [("Dummy.var", "0", "2")]
+    batch = [(parent, request) for (parent, _), request in zip(pipes, requests)]
+    assert broker.answer(batch) == Response.NO
+    assert shown == [("Dummy.var", "0", "1"), ("Dummy.var", "0", "2")]
+    for _, child in pipes:
+        assert child.recv() == "NO"
+
+
+def test_broker_holds_prompt_lock(mocker):
+    """#SPC-broker.tst-batch"""
+    held = []
+    mocker.patch("annotation_abuse.notify.show_message", lambda *args: None)
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: held.append(PROMPT_LOCK._is_owned()) or Response.YES,
+    )
+    broker = ApprovalBroker()
+    parent, child = Pipe()
+    assert broker.answer([(parent, ("Dummy.var", "0", "1"))]) == Response.YES
+    assert held == [True]
+    assert child.recv() == "YES"
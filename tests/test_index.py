@@ -0,0 +1,117 @@
+import copy
+import gc
+import pickle
+
+from annotation_abuse.asts import inrange, MacroError
+from pytest import raises
+
+
+@inrange
+class IndexedClass:
+    var: "0 < var < 100"
+    other: "-1 < other < 1"
+
+
+INDEX = IndexedClass.index("var", buckets=10)
+
+
+@inrange(revalidate=False)
+class TrustedIndexedClass:
+    var: "0 < var < 100"
+
+
+TRUSTED_INDEX = TrustedIndexedClass.index("var", buckets=10)
+
+
+def make(value):
+    dummy = IndexedClass()
+    dummy.var = value
+    return dummy
+
+
+def test_query_matches_scan():
+    """#SPC-index.tst-query"""
+    dummies = [make(value) for value in (0.5, 9.99, 10, 25, 25.5, 50, 99.5)]
+    for lo, hi in [(0, 100), (10, 25.5), (-5, 10), (25, 26), (99, 200), (50, 50)]:
+        found = INDEX.between(lo, hi)
+        expected = [dummy for dummy in dummies if lo <= dummy.var < hi]
+        assert sorted(map(id, found)) == sorted(map(id, expected))
+
+
+def test_setter_moves_instances():
+    """#SPC-index.tst-update"""
+    dummy = make(5)
+    assert dummy in INDEX.between(0, 10)
+    dummy.var = 95
+    assert dummy not in INDEX.between(0, 10)
+    assert dummy in INDEX.between(90, 100)
+    with raises(ValueError):
+        dummy.var = 200
+    assert dummy in INDEX.between(90, 100)
+    dummy.update(var=15, other=0)
+    assert dummy in INDEX.between(10, 20)
+    with raises(ValueError):
+        dummy.update(var=55, other=5)
+    assert dummy in INDEX.between(10, 20)
+
+
+def test_other_constructors_are_indexed():
+    """#SPC-index.tst-update"""
+    records = list(IndexedClass.from_records([(42, 0), (43, 0)]))
+    unpickled = pickle.loads(pickle.dumps(make(44)))
+    copied = copy.copy(make(45))
+    deep = copy.deepcopy(make(46))
+    found = INDEX.between(42, 47)
+    for dummy in records + [unpickled, copied, deep]:
+        assert dummy in found
+    trusted = TrustedIndexedClass()
+    trusted.var = 44
+    unpickled = pickle.loads(pickle.dumps(trusted))
+    assert unpickled.var == 44
+    assert unpickled in TRUSTED_INDEX.between(44, 45)
+
+
+def test_collected_instances_are_dropped():
+    """#SPC-index.tst-update"""
+    dummy = make(77)
+    gc.collect()
+    size = len(INDEX)
+    del dummy
+    gc.collect()
+    assert len(INDEX) == size - 1
+    assert INDEX.between(77, 78) == []
+
+
+def test_index_creation():
+    """#SPC-index.tst-create"""
+    assert IndexedClass.index("var", buckets=10) is INDEX
+    with raises(MacroError):
+        IndexedClass.index("var", buckets=20)
+    with raises(MacroError):
+        IndexedClass.index("missing")
+    with raises(ValueError):
+        IndexedClass.index("other", buckets=0)
+
+    @inrange(frozen=True)
+    class FrozenClass:
+        var: "0 < var < 1"
+
+    assert not hasattr(FrozenClass, "index")
+
+    @inrange
+    class SlottedClass:
+        __slots__ = ("_var",)
+        var: "0 < var < 1"
+
+    with raises(MacroError):
+        SlottedClass.index("var")
+
+    @inrange
+    class WeakSlottedClass:
+        __slots__ = ("_var", "__weakref__")
+        var: "0 < var < 1"
+
+    index = WeakSlottedClass.index("var", buckets=4)
+    dummy = WeakSlottedClass()
+    dummy.var = 0.5
+    assert index.between(0, 1) == [dummy]
@@ -1,6 +1,13 @@
+import annotation_abuse.notify
+import annotation_abuse.scan
+import dataclasses
+import linecache
 import hypothesis.strategies as st
+import threading
+import time
 
 from hypothesis import given
+from pytest import raises
 from annotation_abuse.notify import (
     detect_classvars,
     inherits_init,
@@ -10,6 +17,14 @@ from annotation_abuse.notify import (
     notify,
     interpret_resp,
     Response,
+    PROMPT_LOCK,
+    PENDING,
+    prewarm,
+    INIT_VARS,
+    render_value,
+    NotifyError,
+    set_value_budget,
+    VALUE_BUDGET,
 )
 
 
@@ -188,3 +203,395 @@ def test_prompt_detects_invalid(text):
     """#SPC-notify-intercept.tst-prompt_invalid"""
     resp = interpret_resp(text)
     assert resp == Response.INVALID
+
+
+def test_threadsafe_serializes_prompts(mocker):
+    """#SPC-notify-intercept.tst-serialized"""
+    state = {"active": 0, "max_active": 0, "prompts": 0}
+    state_lock = threading.Lock()
+
+    def slow_prompt():
+        with state_lock:
+            state["active"] += 1
+            state["prompts"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+        time.sleep(0.0005)
+        with state_lock:
+            state["active"] -= 1
+        return Response.YES
+
+    mocker.patch("annotation_abuse.notify.prompt_user", slow_prompt)
+    mocker.patch("annotation_abuse.notify.show_message", lambda *args: None)
+    mocker.patch("annotation_abuse.notify.no_problem_message", lambda: None)
+
+    @notify(threadsafe=True)
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 0
+
+    dummy = DummyClass()
+    n_threads = 8
+    n_writes = 20
+    start = threading.Barrier(n_threads)
+
+    def writer(offset):
+        start.wait()
+        for i in range(n_writes):
+            dummy.var = offset + i
+
+    threads = [
+        threading.Thread(target=writer, args=(t * n_writes,)) for t in range(n_threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state["prompts"] == n_threads * n_writes
+    assert state["max_active"] == 1
+
+
+def test_threadsafe_fast_path_is_lock_free(mocker):
+    """#SPC-notify-intercept.tst-lock_free"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.YES)
+
+    @notify(threadsafe=True)
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 1
+            self.other = 1
+
+    def write_unmarked():
+        dummy = DummyClass()
+        dummy.other = 2
+
+    # Hold the prompt lock as if the user were busy answering another prompt. First
+    # time initialization and unmarked writes must not wait for it.
+    with PROMPT_LOCK:
+        worker = threading.Thread(target=write_unmarked)
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+
+def test_slotted_class(mocker):
+    """#SPC-notify-intercept.tst-slots"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+
+    @notify
+    class DummyClass(object):
+        __slots__ = ("var", "other")
+
+        def __init__(self):
+            self.var: "this one" = 1
+            self.other = 1
+
+    dummy = DummyClass()
+    assert not hasattr(dummy, "__dict__")
+    dummy.var = 2
+    dummy.other = 2
+    assert dummy.var == 1
+    assert dummy.other == 2
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.YES)
+    dummy.var = 2
+    assert dummy.var == 2
+
+
+def test_getattr_default_is_not_a_value(mocker):
+    """#SPC-notify-intercept.tst-slots"""
+    prompts = []
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: prompts.append(1) or Response.NO,
+    )
+
+    @notify
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 1
+
+        def __getattr__(self, name):
+            return None
+
+    dummy = DummyClass()
+    assert prompts == []
+    dummy.var = 2
+    assert prompts == [1]
+    assert dummy.var == 1
+
+
+def test_inherited_property_is_read(mocker):
+    """#SPC-notify-intercept.tst-slots"""
+    shown = []
+    mocker.patch(
+        "annotation_abuse.notify.APPROVER",
+        lambda name, old, new: shown.append(old) or Response.YES,
+    )
+
+    class Base(object):
+        @property
+        def var(self):
+            return self._var
+
+        @var.setter
+        def var(self, value):
+            self._var = value
+
+    @notify
+    class DummyClass(Base):
+        def __init__(self):
+            self.var: "this one" = 1
+
+    dummy = DummyClass()
+    assert shown == []
+    assert dummy.var == 1
+    dummy.var = 2
+    assert shown == [1]
+    assert dummy.var == 2
+
+
+def test_instances_are_independent(mocker):
+    """#SPC-notify-intercept.tst-slots"""
+    prompts = []
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: prompts.append(1) or Response.YES,
+    )
+
+    @notify
+    class DummyClass(object):
+        __slots__ = ("var",)
+
+        def __init__(self, x):
+            self.var: "this one" = x
+
+    first = DummyClass(1)
+    second = DummyClass(2)
+    # Initializing the second instance is not a write to the first one
+    assert len(prompts) == 0
+    assert (first.var, second.var) == (1, 2)
+
+
+def test_lazy_defers_analysis(mocker):
+    """#SPC-notify.tst-lazy"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+    spy = mocker.spy(annotation_abuse.notify, "find_marked_vars")
+
+    @notify(lazy=True)
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 1
+
+    assert spy.call_count == 0
+    assert DummyClass in PENDING
+    dummy = DummyClass()
+    assert spy.call_count == 1
+    assert DummyClass not in PENDING
+    dummy.var = 2
+    assert dummy.var == 1
+    # The analysis only happens once
+    DummyClass()
+    assert spy.call_count == 1
+
+
+def test_prewarm(mocker):
+    """#SPC-notify.tst-prewarm"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+
+    @notify(lazy=True)
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 1
+
+    prewarm(DummyClass)
+    assert DummyClass not in PENDING
+    assert not inherits_init(DummyClass)
+    dummy = DummyClass()
+    dummy.var = 2
+    assert dummy.var == 1
+
+
+def test_lazy_defers_inherited_init(mocker):
+    """#SPC-notify.tst-lazy"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+    scan_spy = mocker.spy(annotation_abuse.scan, "scan_file")
+
+    class Base(object):
+        def __init__(self, x):
+            self.var: "this one" = x
+
+    @notify(lazy=True)
+    class DummyClass(Base):
+        pass
+
+    assert not scan_spy.called
+    assert DummyClass in PENDING
+    dummy = DummyClass(1)
+    assert scan_spy.called
+    assert DummyClass not in PENDING
+    assert "__init__" not in DummyClass.__dict__
+    dummy.var = 2
+    assert dummy.var == 1
+
+
+def test_finds_inherited_instvars(mocker):
+    """#SPC-notify-inst.tst-mro"""
+
+    class Base(object):
+        def __init__(self):
+            self.base_var: "this one" = 1
+
+    class Middle(Base):
+        pass
+
+    class Leaf(Middle):
+        def __init__(self):
+            super().__init__()
+            self.leaf_var: "this one" = 2
+
+    assert find_instvars(Middle) == ["base_var"]
+    assert find_instvars(Leaf) == ["leaf_var", "base_var"]
+    code = Base.__init__.__code__
+    assert (code.co_filename, code) in INIT_VARS
+    # Once analyzed, the base class's `__init__` isn't looked up again
+    mocker.patch("annotation_abuse.scan.scan_file", None)
+    assert find_instvars(Leaf) == ["leaf_var", "base_var"]
+
+
+def test_subclass_keeps_interception(mocker):
+    """#SPC-notify-inst.tst-mro"""
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+
+    @notify
+    class Base(object):
+        def __init__(self):
+            self.var: "this one" = 1
+
+    @notify
+    class Child(Base):
+        other: "this one" = 1
+
+    child = Child()
+    child.var = 2
+    child.other = 2
+    assert child.var == 1
+    assert child.other == 1
+    prompts = []
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: prompts.append(1) or Response.YES,
+    )
+    child.var = 2
+    assert child.var == 2
+    # The base class's `__setattr__` doesn't ask again
+    assert len(prompts) == 1
+
+
+HUGE = 1000000
+
+
+class Huge:
+    def __len__(self):
+        return HUGE
+
+    def __str__(self):
+        raise AssertionError("the whole value was formatted")
+
+    __repr__ = __str__
+
+
+def test_render_value_is_bounded():
+    """#SPC-notify-intercept.tst-render"""
+    assert render_value(1) == "1"
+    assert render_value("text") == "text"
+    assert render_value([1, 2]) == "[1, 2]"
+    assert render_value(list(range(10))) == "[0, 1, 2, 3, 4, 5, 6, 7, 8, 9]"
+    assert render_value({i: i for i in range(5)}) == "{0: 0, 1: 1, 2: 2, 3: 3, 4: 4}"
+    assert render_value((1, 2, 3, 4, 5, 6, 7)) == "(1, 2, 3, 4, 5, 6, 7)"
+    assert render_value(Huge()) == "<Huge of length 1000000>"
+    assert render_value([Huge()]) == "[<Huge of length 1000000>]"
+    for value in ["a" * HUGE, b"a" * HUGE, bytearray(HUGE), list(range(HUGE))]:
+        text = render_value(value)
+        assert len(text) <= VALUE_BUDGET
+        assert "..." in text
+
+
+def test_value_budget(capsys):
+    """#SPC-notify-intercept.tst-render"""
+    try:
+        set_value_budget(10)
+        assert render_value("a" * 20) == "aaaaaaa..."
+        annotation_abuse.notify.show_message("Dummy.var", "a" * 20, Huge())
+        out = capsys.readouterr().out
+        assert 'from "aaaaaaa..."' in out
+        assert 'to "<Huge o...".' in out
+    finally:
+        set_value_budget(VALUE_BUDGET)
+
+
+def test_subclass_keeps_base_classvars(mocker):
+    """#SPC-notify-inst.tst-mro"""
+    prompts = []
+    mocker.patch(
+        "annotation_abuse.notify.prompt_user",
+        lambda: prompts.append(1) or Response.NO,
+    )
+
+    @notify
+    class Base(object):
+        base_var: "this one" = 1
+
+    @notify
+    class Child(Base):
+        child_var: "this one" = 2
+
+    child = Child()
+    child.base_var = 5
+    child.child_var = 5
+    assert len(prompts) == 2
+    assert (child.base_var, child.child_var) == (1, 2)
+
+
+UNSCANNED_SOURCE = '''
+class Unscanned(object):
+    def __init__(self):
+        self.var: "this one" = 1
+'''
+
+
+def test_unscanned_class_is_analyzed():
+    """#SPC-notify-inst.tst-initast"""
+    filename = "<unscanned>"
+    lines = UNSCANNED_SOURCE.splitlines(True)
+    linecache.cache[filename] = (len(UNSCANNED_SOURCE), None, lines, filename)
+    namespace = dict()
+    try:
+        exec(compile(UNSCANNED_SOURCE, filename, "exec"), namespace)
+        assert find_instvars(namespace["Unscanned"]) == ["var"]
+    finally:
+        del linecache.cache[filename]
+
+
+def test_class_without_source_is_rejected():
+    """#SPC-notify-inst.tst-initast"""
+    namespace = dict()
+    exec(compile(UNSCANNED_SOURCE, "<nowhere>", "exec"), namespace)
+    with raises(NotifyError):
+        notify(namespace["Unscanned"])
+
+
+def test_base_without_source_is_skipped():
+    """#SPC-notify-inst.tst-initast"""
+
+    @dataclasses.dataclass
+    class Base:
+        var: int = 0
+
+    @notify
+    class Child(Base):
+        def __init__(self):
+            super().__init__()
+            self.other: "this one" = 1
+
+    assert Child.__setattr__.marked_vars == ["other"]
+    code = Base.__init__.__code__
+    assert INIT_VARS[(code.co_filename, code)] is None
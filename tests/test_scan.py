@@ -0,0 +1,95 @@
+from annotation_abuse.asts import inrange
+from annotation_abuse.notify import notify, Response
+from annotation_abuse.scan import lookup, scan_source, INITS, REGISTRY
+
+NESTED_SOURCE = """
+@notify
+class Outer:
+    @inrange
+    class Inner:
+        var: "0 < var < 1"
+
+    def method(self):
+        @notify
+        class Local:
+            pass
+
+def func():
+    if True:
+        @notify
+        class Dup:
+            pass
+    else:
+        @notify
+        class Dup:
+            pass
+
+class Undecorated:
+    pass
+"""
+
+
+@notify
+class ScannedNotify(object):
+    flag: "this one" = True
+
+    def __init__(self):
+        self.var: "this one" = 1
+        self.other = 2
+
+
+@inrange
+class ScannedRange:
+    var: "0 < var < 1"
+    other: "-5 < other < 5.5"
+
+
+def test_finds_notify_metadata():
+    """#SPC-scan.tst-notify"""
+    entry = lookup(ScannedNotify)
+    assert INITS[(__file__, entry.init_lineno)] == ["var"]
+    assert entry.classvars == ["flag"]
+    assert entry.describes(ScannedNotify)
+
+
+def test_finds_range_endpoints():
+    """#SPC-scan.tst-ranges"""
+    entry = lookup(ScannedRange)
+    assert entry.ranges["var"] == ("0 < var < 1", 0, 1)
+    assert entry.ranges["other"] == ("-5 < other < 5.5", -5, 5.5)
+    dummy = ScannedRange()
+    dummy.other = 5.25
+    assert dummy.other == 5.25
+
+
+def test_qualnames():
+    """#SPC-scan.tst-qualnames"""
+    entries = scan_source(NESTED_SOURCE, "<nested>")
+    assert set(entries.keys()) == {
+        "Outer",
+        "Outer.Inner",
+        "Outer.method.<locals>.Local",
+        "func.<locals>.Dup",
+    }
+    # Classes that can't be told apart by their qualified name are left to the decorator
+    assert entries["func.<locals>.Dup"] is None
+    assert REGISTRY[("<nested>", "Outer.Inner")].ranges["var"][1:] == (0, 1)
+
+
+def test_decorator_uses_registry(mocker):
+    """#SPC-scan.tst-lookup"""
+
+    def fail(*args):
+        raise AssertionError("module was parsed again")
+
+    mocker.patch("annotation_abuse.scan.scan_source", fail)
+    mocker.patch("annotation_abuse.notify.prompt_user", lambda: Response.NO)
+
+    @notify
+    class DummyClass(object):
+        def __init__(self):
+            self.var: "this one" = 1
+
+    dummy = DummyClass()
+    dummy.var = 2
+    assert dummy.var == 1